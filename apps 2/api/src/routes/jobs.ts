@@ -156,6 +156,33 @@ export default async function jobRoutes(fastify: FastifyInstance) {
     return job;
   });
 
+  // Batched job lookup for workers (protected by API key)
+  // Used by the renderer to resolve voiceJobId outputs in one request
+  fastify.post("/outputs", async (request, reply) => {
+    const apiKey = request.headers["x-worker-api-key"] || "";
+    const expectedKey = process.env.WORKER_API_KEY || "";
+
+    // Allow empty API key in development or if not set
+    if (expectedKey && apiKey !== expectedKey) {
+      return reply.code(401).send({ error: "Unauthorized" });
+    }
+
+    const body = z
+      .object({
+        jobIds: z.array(z.string()).max(1000),
+        userId: z.string(),
+      })
+      .parse(request.body);
+
+    // Only the requesting job's owner's outputs, so a timeline can't pull in other users' jobs
+    const jobs = await fastify.prisma.job.findMany({
+      where: { id: { in: body.jobIds }, userId: body.userId },
+      select: { id: true, type: true, status: true, output: true },
+    });
+
+    return { jobs };
+  });
+
   // Delete job
   fastify.delete(
     "/:id",
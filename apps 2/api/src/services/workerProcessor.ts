@@ -38,6 +38,9 @@ export function createWorkerProcessor(fastify: FastifyInstance, redis: Redis) {
 
       fastify.log.info(`Dispatching job ${jobId} to ${workerUrl}`);
 
+      // The renderer reads source paths from the timeline clips themselves
+      const payload = type === "render" ? await withClipSources(fastify, input, userId, projectId) : input;
+
       // Call worker /execute endpoint
       const response = await fetch(`${workerUrl}/execute`, {
         method: "POST",
@@ -49,7 +52,7 @@ export function createWorkerProcessor(fastify: FastifyInstance, redis: Redis) {
           jobId,
           type,
           input: {
-            ...input,
+            ...payload,
             userId,
             projectId,
           },
@@ -131,3 +134,66 @@ export function createWorkerProcessor(fastify: FastifyInstance, redis: Redis) {
   return worker;
 }
 
+
+/**
+ * Copy each timeline clip's source data (filePath, audioTrack, subtitles) from
+ * the Clip model into a render job's timeline, with one query for all clips.
+ * Only Clip rows of the job's own project are used, and source data sent in
+ * the timeline is always replaced, so a timeline cannot point the renderer at
+ * another user's objects. Video clips must resolve to such a Clip.
+ */
+async function withClipSources(fastify: FastifyInstance, input: any, userId: string, projectId?: string) {
+  const timeline = input?.timeline;
+  if (!timeline?.tracks) {
+    return input;
+  }
+  if (!projectId) {
+    throw new Error("Render jobs require a projectId");
+  }
+
+  const clipIds = [
+    ...new Set<string>(
+      timeline.tracks.flatMap((track: any) =>
+        (track.clips || []).map((clip: any) => clip.clipId).filter(Boolean)
+      )
+    ),
+  ];
+  const clips = await fastify.prisma.clip.findMany({
+    where: { id: { in: clipIds }, projectId, project: { userId } },
+    select: { id: true, filePath: true, audioTrack: true, subtitles: true },
+  });
+  const sources = new Map(clips.map((clip) => [clip.id, clip] as const));
+
+  const unresolved = timeline.tracks
+    .filter((track: any) => track.type === "video")
+    .flatMap((track: any) => track.clips || [])
+    .filter((clip: any) => !sources.has(clip.clipId))
+    .map((clip: any) => clip.id);
+  if (unresolved.length > 0) {
+    throw new Error(`Video clips not found in project ${projectId}: ${unresolved.join(", ")}`);
+  }
+
+  return {
+    ...input,
+    timeline: {
+      ...timeline,
+      tracks: timeline.tracks.map((track: any) => ({
+        ...track,
+        clips: (track.clips || []).map((clip: any) => {
+          // Clips without a Clip row (e.g. voice clips) keep no source data of their own
+          const { filePath, audioTrack, subtitles, ...rest } = clip;
+          const source = sources.get(clip.clipId);
+          if (!source) {
+            return rest;
+          }
+          return {
+            ...rest,
+            filePath: source.filePath,
+            audioTrack: source.audioTrack ?? undefined,
+            subtitles: source.subtitles ?? undefined,
+          };
+        }),
+      })),
+    },
+  };
+}
@@ -22,12 +22,24 @@ export interface Track {
   clips: Clip[];
   locked?: boolean;
   muted?: boolean;
-  volume?: number; // 0-1
+  volume?: number; // Linear gain (1 = unchanged)
+  role?: "voice" | "music" | "effects"; // Audio tracks (inferred from voice clips if omitted)
+  ducking?: AudioDucking; // Lower this track while voice tracks are playing
+}
+
+export interface AudioDucking {
+  amount?: number; // Gain reduction in dB (default -12)
+  attack?: number; // Seconds to ramp down before voice starts (default 0.2)
+  release?: number; // Seconds to ramp back up after voice ends (default 0.5)
 }
 
 export interface Clip {
   id: string;
   clipId: string; // Reference to Clip model
+  // Denormalized from the Clip model when a render job is dispatched (never taken from the client)
+  filePath?: string; // S3 path to the source video
+  audioTrack?: AudioTrack;
+  subtitles?: SubtitleTrack[];
   startTime: number; // Start time in timeline (seconds)
   duration: number; // Clip duration in timeline
   sourceStartTime?: number; // Start time in source video (for trimming)
@@ -36,6 +48,8 @@ export interface Clip {
   position?: { x: number; y: number }; // For video tracks (positioning)
   scale?: number; // For video tracks (scaling)
   opacity?: number; // 0-1
+  fadeIn?: number; // Audio fade-in length in seconds
+  fadeOut?: number; // Audio fade-out length in seconds
   // Voice track support
   voiceId?: string; // Reference to Voice model
   voiceText?: string; // Text to synthesize
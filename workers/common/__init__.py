@@ -0,0 +1,5 @@
+"""
+Worker Common
+Modules shared by every worker: S3 transfer settings, the node-local asset cache
+and the job runner. Each worker image copies this package next to its src/
+"""
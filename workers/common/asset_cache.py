@@ -0,0 +1,165 @@
+"""
+Shared Asset Cache
+Node-local, content-addressed cache of S3 objects shared by all workers on a host
+Mount the same ASSET_CACHE_DIR into every worker so a clip is pulled from S3 once per node
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from botocore.exceptions import ClientError
+
+
+class SharedAssetCache:
+    """
+    Content-addressed S3 object cache with atomic fills, per-key file locks,
+    ETag validation and size-bounded LRU eviction
+    Entries are keyed by bucket/key + ETag, so an object overwritten in S3 is
+    fetched again. Files are handed out as hard links, so eviction never pulls
+    a file out from under a running job. Hard links only work within the
+    cache's filesystem: jobs put downloads in work_dir (see download_dir()),
+    anywhere else a hit costs a full copy.
+    """
+
+    def __init__(self, s3_client: Any, root: str, max_bytes: int, transfer_config: Any = None):
+        self.s3_client = s3_client
+        self.root = root
+        self.max_bytes = max_bytes
+        self.transfer_config = transfer_config
+        self._objects_dir = os.path.join(root, "objects")
+        self._locks_dir = os.path.join(root, "locks")
+        self.work_dir = os.path.join(root, "work")  # Job download files, linked from objects/
+        os.makedirs(self._objects_dir, exist_ok=True)
+        os.makedirs(self._locks_dir, exist_ok=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def download(self, s3_path: str, local_path: str):
+        """Drop-in for download_from_s3: place the object at local_path via the cache"""
+        for attempt in range(2):
+            cached_path = self.fetch(s3_path)
+            try:
+                self._link(cached_path, local_path)
+                return
+            except FileNotFoundError:
+                # Evicted by another worker between fetch and link
+                if attempt:
+                    raise
+
+    def fetch(self, s3_path: str, retries: int = 1) -> str:
+        """Return the cached path of the current object version, downloading it on a miss"""
+        if not s3_path.startswith("s3://"):
+            raise ValueError(f"Invalid S3 path: {s3_path}")
+        bucket, _, key = s3_path[5:].partition("/")
+
+        etag = self.s3_client.head_object(Bucket=bucket, Key=key)["ETag"]
+        cache_key = hashlib.sha256(f"{bucket}/{key}|{etag}".encode("utf-8")).hexdigest()
+        cached_path = os.path.join(self._objects_dir, cache_key + os.path.splitext(key)[1])
+
+        if self._touch(cached_path):
+            return cached_path
+
+        # One download per key across all workers; the rest wait and then hit
+        with self._lock(cache_key):
+            if self._touch(cached_path):
+                return cached_path
+            temp_path = f"{cached_path}.{uuid.uuid4()}.tmp"
+            try:
+                self.s3_client.download_file(bucket, key, temp_path, Config=self.transfer_config)
+                changed = self.s3_client.head_object(Bucket=bucket, Key=key)["ETag"] != etag
+                if not changed:
+                    os.replace(temp_path, cached_path)  # Atomic fill
+            except (ClientError, OSError):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        if changed:
+            # Overwritten mid-download: never store a newer version under the old ETag's key
+            os.remove(temp_path)
+            if not retries:
+                raise RuntimeError(f"S3 object changed during download: {s3_path}")
+            return self.fetch(s3_path, retries - 1)
+
+        self._evict(keep=cached_path)
+        return cached_path
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Mark an entry recently used; False if it doesn't exist"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _link(self, cached_path: str, local_path: str):
+        """Hard-link a cached file to local_path (copy if on another filesystem)"""
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        try:
+            os.link(cached_path, local_path)
+        except FileNotFoundError:
+            raise
+        except OSError as e:
+            # Different filesystem (e.g. /tmp vs a mounted cache volume)
+            print(f"Asset cache: copying {cached_path} to {local_path} ({e}); download into {self.work_dir} to link")
+            shutil.copyfile(cached_path, local_path)
+
+    @contextmanager
+    def _lock(self, cache_key: str):
+        """Exclusive lock on one key, shared by every process on the host"""
+        with open(os.path.join(self._locks_dir, f"{cache_key}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self, keep: str):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self._objects_dir):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def cache_from_env(s3_client: Any, transfer_config: Any = None) -> Optional[SharedAssetCache]:
+    """
+    Build the cache from ASSET_CACHE_DIR / ASSET_CACHE_MAX_BYTES (None if disabled)
+    Opt-in: a directory private to one container would only duplicate its downloads
+    """
+    root = os.getenv("ASSET_CACHE_DIR", "")
+    max_bytes = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+    if not root or max_bytes <= 0:
+        return None
+    return SharedAssetCache(s3_client, root, max_bytes, transfer_config)
+
+
+def download_dir(cache: Optional[SharedAssetCache]) -> str:
+    """Directory for a job's downloaded files: the cache's work_dir, so hits are hard links"""
+    return cache.work_dir if cache else tempfile.gettempdir()
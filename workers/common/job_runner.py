@@ -0,0 +1,87 @@
+"""
+Job Runner
+Runs jobs' blocking stages (ffmpeg, model inference, S3 transfers, frame decoding)
+off the asyncio event loop, so /health and /execute stay responsive while jobs run
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+
+class JobRunner:
+    """
+    Bounded job execution for one worker process
+    At most max_jobs jobs run at once; later ones wait for a slot. Blocking
+    stages run on a dedicated thread pool - ffmpeg subprocesses, PyTorch,
+    ONNX Runtime, OpenCV and boto3 all release the GIL, so threads run them
+    in parallel without loading a model copy per process.
+    """
+
+    def __init__(self, max_jobs: int, max_threads: int):
+        self.max_jobs = max(max_jobs, 1)
+        self._slots = asyncio.Semaphore(self.max_jobs)
+        self._pool = ThreadPoolExecutor(max_workers=max(max_threads, 1), thread_name_prefix="job")
+        self.running = 0
+        self.queued = 0
+
+    async def submit(self, process: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """Run a job coroutine once a slot is free (use as the background task)"""
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            await process(*args, **kwargs)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call on the job pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def gather(self, calls: Iterable[Callable[[], Any]], limit: int) -> List[Any]:
+        """
+        Run independent blocking calls (e.g. S3 transfers) concurrently, at most
+        limit at a time, and return their results in order
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=max(min(limit, len(calls)), 1), thread_name_prefix="job-io")
+        try:
+            return await asyncio.gather(*(loop.run_in_executor(pool, call) for call in calls))
+        finally:
+            pool.shutdown(wait=False)
+
+    @staticmethod
+    def threadsafe(report: Callable[..., Awaitable[Any]]) -> Callable[..., None]:
+        """
+        Wrap an async callback (e.g. a status update) so a blocking stage can
+        fire it from a pool thread; the coroutine runs on the event loop
+        """
+        loop = asyncio.get_running_loop()
+
+        def call(*args, **kwargs):
+            asyncio.run_coroutine_threadsafe(report(*args, **kwargs), loop)
+
+        return call
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts for /health"""
+        return {"running": self.running, "queued": self.queued, "maxConcurrent": self.max_jobs}
+
+
+def runner_from_env(default_jobs: int = 1) -> JobRunner:
+    """Build the runner from JOB_CONCURRENCY / JOB_THREADS"""
+    max_jobs = int(os.getenv("JOB_CONCURRENCY", str(default_jobs)))
+    # One thread per running job is enough: a job's stages run one after another
+    max_threads = int(os.getenv("JOB_THREADS", str(max_jobs)))
+    return JobRunner(max_jobs, max_threads)
@@ -0,0 +1,117 @@
+"""
+S3 Transfer
+Shared multipart transfer settings and streaming multipart upload for workers
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from boto3.s3.transfer import TransferConfig
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+
+# Part size and parallel parts per object, for uploads and ranged downloads
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE_MB", "16")) * 1024 * 1024, MIN_PART_SIZE)
+S3_PART_CONCURRENCY = int(os.getenv("S3_PART_CONCURRENCY", "8"))
+
+# Lifetime of presigned source URLs (S3_STREAM_SOURCES), in seconds
+S3_PRESIGN_EXPIRY = int(os.getenv("S3_PRESIGN_EXPIRY", "21600"))
+
+
+def transfer_config_from_env() -> TransferConfig:
+    """Multipart TransferConfig from S3_PART_SIZE_MB / S3_PART_CONCURRENCY"""
+    return TransferConfig(
+        multipart_threshold=S3_PART_SIZE,
+        multipart_chunksize=S3_PART_SIZE,
+        max_concurrency=max(S3_PART_CONCURRENCY, 1),
+    )
+
+
+def presign_s3_url(s3_client: Any, s3_path: str, expires_in: int = S3_PRESIGN_EXPIRY) -> str:
+    """Presigned GET URL for s3://bucket/key, so ffmpeg can read the object with HTTP range requests"""
+    if not s3_path.startswith("s3://"):
+        raise ValueError(f"Invalid S3 path: {s3_path}")
+    bucket, _, key = s3_path[5:].partition("/")
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket, "Key": key},
+        ExpiresIn=expires_in,
+    )
+
+
+class MultipartStreamUpload:
+    """
+    Multipart upload of a byte stream whose total size isn't known yet
+    write() buffers data and uploads each full part in the background, so an
+    upload can run while the producer (e.g. ffmpeg writing to a pipe) is still
+    going. Call complete() at the end, or abort() on failure.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        key: str,
+        part_size: int = S3_PART_SIZE,
+        max_concurrency: int = S3_PART_CONCURRENCY,
+        content_type: Optional[str] = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        extra = {"ContentType": content_type} if content_type else {}
+        self.upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, **extra)["UploadId"]
+        self._buffer = bytearray()
+        self._pool = ThreadPoolExecutor(max_workers=max(max_concurrency, 1))
+        # Bounds buffered parts (memory) to the number being uploaded
+        self._slots = threading.Semaphore(max(max_concurrency, 1))
+        self._futures: List[Future] = []
+
+    def write(self, data: bytes):
+        """Buffer data, uploading each full part as soon as it is available"""
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+    def complete(self) -> str:
+        """Upload the final part, finish the upload and return the S3 path"""
+        if self._buffer or not self._futures:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        parts = [future.result() for future in self._futures]
+        self._pool.shutdown(wait=True)
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+        return f"s3://{self.bucket}/{self.key}"
+
+    def abort(self):
+        """Cancel the upload and discard uploaded parts"""
+        for future in self._futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def _submit(self, body: bytes):
+        part_number = len(self._futures) + 1
+        self._slots.acquire()
+        future = self._pool.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number: int, body: bytes) -> Dict[str, Any]:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
@@ -0,0 +1,322 @@
+"""
+Face Pipeline
+Decode -> detect -> embed as a pipeline, so CPU-only nodes keep every core busy
+- a decoder thread fills a bounded queue of frames
+- detector threads run the ONNX detector on several frames at once
+- face crops from many frames go through the recognition model as one batch
+- optionally, frames likely to hold small faces are re-detected at higher resolution
+- optionally, only every Nth frame is detected; frames in between track the faces
+  with optical flow and reuse their embeddings
+- given shot boundaries (scene cuts), cut frames are always detected and nothing
+  carries over across a cut
+Results are yielded in frame order.
+"""
+
+import math
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import onnxruntime
+from insightface.utils import face_align
+
+from face_tracker import FACE_TRACK_CONFIDENT, FACE_TRACK_IOU, OpticalFlowTracker, box_iou
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Frames detected concurrently, and ONNX Runtime threads per inference call;
+# together they should roughly cover the cores
+FACE_DETECT_WORKERS = int(os.getenv("FACE_DETECT_WORKERS", str(max(CPU_COUNT // 4, 1))))
+FACE_ONNX_THREADS = int(os.getenv("FACE_ONNX_THREADS", str(max(CPU_COUNT // FACE_DETECT_WORKERS, 1))))
+
+# Face crops per recognition batch
+FACE_BATCH_SIZE = int(os.getenv("FACE_BATCH_SIZE", "32"))
+
+# Adaptive resolution: faces under this many detector pixels tall make the next
+# sample run a second, higher-resolution pass (up to FACE_ADAPTIVE_MAX_SIDE px)
+FACE_SMALL_PX = int(os.getenv("FACE_SMALL_PX", "32"))
+FACE_ADAPTIVE_MAX_SIDE = int(os.getenv("FACE_ADAPTIVE_MAX_SIDE", "1920"))
+
+_END = object()
+
+
+class DetectedFace:
+    """
+    One face: box, 5-point landmarks (eyes, nose, mouth corners), score, embedding
+    source is "detected" or "tracked"; a face continuing a track takes its
+    embedding from parent (the same face in the previous sample) instead of a crop
+    """
+
+    __slots__ = ("bbox", "kps", "det_score", "embedding", "source", "parent")
+
+    def __init__(
+        self,
+        bbox: np.ndarray,
+        kps: Optional[np.ndarray],
+        det_score: float,
+        source: str = "detected",
+    ):
+        self.bbox = bbox
+        self.kps = kps
+        self.det_score = det_score
+        self.embedding: Optional[np.ndarray] = None
+        self.source = source
+        self.parent: Optional["DetectedFace"] = None
+
+
+def tune_sessions(app: Any, intra_threads: int = FACE_ONNX_THREADS):
+    """
+    Recreate a prepared FaceAnalysis' ONNX sessions with explicit thread settings
+    (insightface doesn't pass SessionOptions through). Each call uses intra_threads;
+    parallelism across frames comes from the pipeline's detector threads.
+    """
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = max(intra_threads, 1)
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    for model in app.models.values():
+        model.session = onnxruntime.InferenceSession(
+            model.model_file, sess_options=options, providers=model.session.get_providers()
+        )
+
+
+class FacePipeline:
+    """
+    Pipelined detection + batched recognition over (frame_number, frame) pairs
+    With detect_interval > 1 only every detect_interval-th sample is detected;
+    the others are tracked from the previous sample (falling back to detection
+    when a face is lost) and only new or uncertain faces are embedded.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        min_score: float = 0.0,
+        workers: int = FACE_DETECT_WORKERS,
+        batch_size: int = FACE_BATCH_SIZE,
+        adaptive: bool = False,
+        detect_interval: int = 1,
+        cuts: Iterable[int] = (),
+    ):
+        self.detector = app.det_model
+        self.recognizer = app.models.get("recognition")
+        self.min_score = min_score
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        # Per-call input sizes need a detector exported with dynamic height/width
+        self.adaptive = adaptive and isinstance(self.detector.input_shape[2], str)
+        self.detail_frames = 0  # Frames that needed the high-resolution pass
+        self._expect_small = False
+        self._last_count = 0
+
+        self.detect_interval = max(detect_interval, 1)
+        self.tracker = OpticalFlowTracker() if self.detect_interval > 1 else None
+        self.detected_frames = 0
+        self.tracked_frames = 0
+        self._prev_luma: Optional[Tuple[np.ndarray, float]] = None
+        self._prev_faces: List[DetectedFace] = []
+        self.cuts: Set[int] = set(cuts)  # First frames of shots
+
+    def run(self, frames: Iterable[Tuple[int, np.ndarray]]) -> Iterator[Tuple[int, List[DetectedFace]]]:
+        """Yield (frame_number, faces) in input order; faces below min_score are dropped"""
+        frame_queue: "queue.Queue" = queue.Queue(maxsize=self.workers * 2)
+        stop = threading.Event()
+        decoder = threading.Thread(target=self._decode, args=(frames, frame_queue, stop), daemon=True)
+        decoder.start()
+
+        in_flight: Deque[Tuple[int, np.ndarray, Optional[Future]]] = deque()
+        pending: List[Tuple[int, List[DetectedFace]]] = []
+        crops: List[np.ndarray] = []
+        crop_faces: List[DetectedFace] = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="detect") as pool:
+                sample = 0
+                while True:
+                    item = frame_queue.get()
+                    if item is _END:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    frame_number, frame = item
+                    # Frames between keyframes are tracked in order by _collect
+                    if frame_number in self.cuts:
+                        sample = 0  # A new shot starts with a detection
+                    keyframe = sample % self.detect_interval == 0
+                    in_flight.append((frame_number, frame, pool.submit(self._detect, frame) if keyframe else None))
+                    sample += 1
+
+                    # Keep detector threads busy; collect the oldest frame in order
+                    if len(in_flight) >= self.workers * 2:
+                        self._collect(in_flight.popleft(), pending, crops, crop_faces)
+                        if len(crops) >= self.batch_size or len(pending) >= self.batch_size:
+                            yield from self._flush(pending, crops, crop_faces)
+
+                while in_flight:
+                    self._collect(in_flight.popleft(), pending, crops, crop_faces)
+                yield from self._flush(pending, crops, crop_faces)
+        finally:
+            stop.set()
+            decoder.join()
+
+    @staticmethod
+    def _decode(frames: Iterable[Tuple[int, np.ndarray]], frame_queue: "queue.Queue", stop: threading.Event):
+        """Decoder thread: fill the bounded queue until the source ends or the consumer stops"""
+        iterator = iter(frames)
+        try:
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        frame_queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            item = _END
+        except BaseException as e:
+            item = e
+        finally:
+            # Stops a decoder subprocess if the consumer quit early
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _detect(self, frame: np.ndarray, input_size: Optional[Tuple[int, int]] = None) -> List[DetectedFace]:
+        bboxes, kpss = self.detector.detect(frame, input_size=input_size, max_num=0, metric="default")
+        faces = []
+        for i in range(bboxes.shape[0]):
+            det_score = float(bboxes[i, 4])
+            if det_score < self.min_score:
+                continue
+            faces.append(DetectedFace(bboxes[i, 0:4], kpss[i] if kpss is not None else None, det_score))
+        return faces
+
+    def _collect(
+        self,
+        entry: Tuple[int, np.ndarray, Optional[Future]],
+        pending: List[Tuple[int, List[DetectedFace]]],
+        crops: List[np.ndarray],
+        crop_faces: List[DetectedFace],
+    ):
+        """Wait for (or track) one frame's faces and queue new faces' crops for recognition"""
+        frame_number, frame, future = entry
+        if frame_number in self.cuts:
+            # Nothing before a cut predicts what follows it
+            self._prev_faces = []
+            self._expect_small = False
+            self._last_count = 0
+        luma = self.tracker.prepare(frame) if self.tracker else None
+        faces = self._track(luma) if future is None else None
+        if faces is None:
+            faces = future.result() if future is not None else self._detect(frame)
+            if self.adaptive:
+                faces = self._refine(frame, faces)
+            if self.tracker:
+                self._continue_tracks(faces)
+            self.detected_frames += 1
+        else:
+            self.tracked_frames += 1
+        if self.tracker:
+            self._prev_luma, self._prev_faces = luma, faces
+
+        if self.recognizer is not None:
+            size = self.recognizer.input_size[0]
+            for face in faces:
+                if face.kps is not None and face.parent is None:
+                    crops.append(face_align.norm_crop(frame, landmark=face.kps, image_size=size))
+                    crop_faces.append(face)
+        pending.append((frame_number, faces))
+
+    def _refine(self, frame: np.ndarray, faces: List[DetectedFace]) -> List[DetectedFace]:
+        """
+        Re-detect at higher resolution where small faces are expected: the previous
+        sample had one, or faces went missing since then. Runs in frame order.
+        """
+        det_w, det_h = self.detector.input_size
+        det_ratio = min(det_w / frame.shape[1], det_h / frame.shape[0])
+        if det_ratio < 1 and (self._expect_small or len(faces) < self._last_count):
+            ratio = min(FACE_ADAPTIVE_MAX_SIDE / max(frame.shape[:2]), 1.0)
+            input_size = (
+                math.ceil(frame.shape[1] * ratio / 32) * 32,
+                math.ceil(frame.shape[0] * ratio / 32) * 32,
+            )
+            if input_size[0] > det_w or input_size[1] > det_h:
+                faces = self._detect(frame, input_size)
+                self.detail_frames += 1
+
+        self._last_count = len(faces)
+        self._expect_small = any(
+            (face.bbox[3] - face.bbox[1]) * det_ratio < FACE_SMALL_PX for face in faces
+        )
+        return faces
+
+    def _track(self, luma: Tuple[np.ndarray, float]) -> Optional[List[DetectedFace]]:
+        """Carry the previous sample's faces forward; None if any of them was lost"""
+        previous = [face for face in self._prev_faces if face.kps is not None]
+        if self._prev_luma is None or not previous:
+            # Nothing to follow; faces appearing now are found at the next keyframe
+            return [] if self._prev_luma is not None else None
+        results = self.tracker.track(self._prev_luma, luma, [(face.bbox, face.kps) for face in previous])
+        if any(result is None for result in results):
+            return None
+
+        faces = []
+        for prev, (bbox, kps, good_share) in zip(previous, results):
+            face = DetectedFace(bbox, kps, prev.det_score, source="tracked")
+            if good_share >= FACE_TRACK_CONFIDENT:
+                face.parent = prev  # Confident track: same identity, reuse the embedding
+            faces.append(face)
+        return faces
+
+    def _continue_tracks(self, faces: List[DetectedFace]):
+        """Detected faces overlapping a face of the previous sample keep its embedding"""
+        pairs = sorted(
+            (
+                (box_iou(face.bbox, prev.bbox), i, j)
+                for i, face in enumerate(faces)
+                for j, prev in enumerate(self._prev_faces)
+            ),
+            reverse=True,
+        )
+        used_faces, used_prev = set(), set()
+        for iou, i, j in pairs:
+            if iou < FACE_TRACK_IOU:
+                break
+            if i in used_faces or j in used_prev:
+                continue
+            used_faces.add(i)
+            used_prev.add(j)
+            faces[i].parent = self._prev_faces[j]
+
+    def _flush(
+        self,
+        pending: List[Tuple[int, List[DetectedFace]]],
+        crops: List[np.ndarray],
+        crop_faces: List[DetectedFace],
+    ) -> Iterator[Tuple[int, List[DetectedFace]]]:
+        """Embed all queued crops in one batch, then release their frames in order"""
+        if crops:
+            embeddings = self.recognizer.get_feat(crops)
+            for face, embedding in zip(crop_faces, embeddings):
+                face.embedding = embedding
+        # Parents are in earlier frames, so their embeddings are already resolved
+        for _, faces in pending:
+            for face in faces:
+                if face.parent is not None:
+                    face.embedding = face.parent.embedding
+                    face.parent = None
+        results = list(pending)
+        pending.clear()
+        crops.clear()
+        crop_faces.clear()
+        yield from results
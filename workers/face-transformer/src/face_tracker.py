@@ -0,0 +1,131 @@
+"""
+Face Tracker
+Carries face boxes and landmarks between detector keyframes with sparse
+Lucas-Kanade optical flow, checked forward-backward
+"""
+
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Share of a face's flow points that must track cleanly: below MIN_GOOD the face is
+# lost (the frame falls back to the detector), below CONFIDENT it is re-embedded
+FACE_TRACK_MIN_GOOD = float(os.getenv("FACE_TRACK_MIN_GOOD", "0.5"))
+FACE_TRACK_CONFIDENT = float(os.getenv("FACE_TRACK_CONFIDENT", "0.8"))
+
+# Detections overlapping a tracked face this much continue its track (and its embedding)
+FACE_TRACK_IOU = float(os.getenv("FACE_TRACK_IOU", "0.5"))
+
+FLOW_MAX_SIDE = 640  # Optical flow runs on luma downscaled to this
+GRID = 3  # GRID x GRID points inside each box, in addition to the 5 landmarks
+
+# The face patch must still look alike after the move (normalized correlation of
+# PATCH x PATCH luma); catches flow that latched onto the background at a cut
+MIN_PATCH_CORRELATION = 0.5
+PATCH = 24
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+# (bbox [x1, y1, x2, y2], kps 5x2, share of points tracked), or None if lost
+TrackResult = Optional[Tuple[np.ndarray, np.ndarray, float]]
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+class OpticalFlowTracker:
+    """Propagates faces from one frame to the next (translation + scale per face)"""
+
+    def prepare(self, frame: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Downscaled luma of a BGR frame, and the frame -> luma scale factor"""
+        ratio = min(FLOW_MAX_SIDE / max(frame.shape[:2]), 1.0)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if ratio < 1.0:
+            gray = cv2.resize(gray, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA)
+        return gray, ratio
+
+    def track(
+        self,
+        prev: Tuple[np.ndarray, float],
+        curr: Tuple[np.ndarray, float],
+        faces: Sequence[Tuple[np.ndarray, np.ndarray]],
+    ) -> List[TrackResult]:
+        """Move each (bbox, kps) from prev to curr; one optical flow call for all faces"""
+        if not faces:
+            return []
+        (prev_gray, ratio), (curr_gray, _) = prev, curr
+
+        points = np.concatenate([self._points(bbox, kps) for bbox, kps in faces]) * ratio
+        points = points.astype(np.float32).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, curr_gray, points, None, **LK_PARAMS)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(curr_gray, prev_gray, moved, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+        ok = (status.ravel() == 1) & (back_status.ravel() == 1)
+
+        per_face = GRID * GRID + 5
+        results: List[TrackResult] = []
+        for i, (bbox, kps) in enumerate(faces):
+            span = slice(i * per_face, (i + 1) * per_face)
+            face_height = (bbox[3] - bbox[1]) * ratio
+            good = ok[span] & (fb_error[span] < max(1.0, 0.02 * face_height))
+            good_share = float(good.mean())
+            if good_share < FACE_TRACK_MIN_GOOD:
+                results.append(None)
+                continue
+
+            p = points[span].reshape(-1, 2)[good] / ratio
+            q = moved[span].reshape(-1, 2)[good] / ratio
+            shift = np.median(q - p, axis=0)
+            spread_p = np.linalg.norm(p - p.mean(axis=0), axis=1)
+            spread_q = np.linalg.norm(q - q.mean(axis=0), axis=1)
+            valid = spread_p > 1e-3
+            scale = float(np.median(spread_q[valid] / spread_p[valid])) if valid.any() else 1.0
+            scale = min(max(scale, 0.8), 1.25)
+
+            center = np.array([(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2])
+            new_center = center + shift
+            half = np.array([bbox[2] - bbox[0], bbox[3] - bbox[1]]) * scale / 2
+            new_bbox = np.concatenate([new_center - half, new_center + half])
+            new_kps = (kps - center) * scale + new_center
+            before = self._patch(prev_gray, np.asarray(bbox[:4]) * ratio)
+            after = self._patch(curr_gray, new_bbox * ratio)
+            if before is None or after is None or float((before * after).mean()) < MIN_PATCH_CORRELATION:
+                results.append(None)
+                continue
+            results.append((new_bbox, new_kps, good_share))
+        return results
+
+    @staticmethod
+    def _patch(gray: np.ndarray, box: np.ndarray) -> Optional[np.ndarray]:
+        """Zero-mean, unit-variance PATCH x PATCH resample of a box (None if off-frame)"""
+        x1, y1 = max(int(box[0]), 0), max(int(box[1]), 0)
+        x2, y2 = min(int(np.ceil(box[2])), gray.shape[1]), min(int(np.ceil(box[3])), gray.shape[0])
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        patch = cv2.resize(gray[y1:y2, x1:x2], (PATCH, PATCH), interpolation=cv2.INTER_AREA).astype(np.float32)
+        patch -= patch.mean()
+        std = patch.std()
+        return patch / std if std > 1e-3 else None
+
+    @staticmethod
+    def _points(bbox: np.ndarray, kps: np.ndarray) -> np.ndarray:
+        """Landmarks plus a grid over the central part of the box"""
+        x1, y1, x2, y2 = bbox[:4]
+        xs = np.linspace(x1 + (x2 - x1) * 0.2, x2 - (x2 - x1) * 0.2, GRID)
+        ys = np.linspace(y1 + (y2 - y1) * 0.2, y2 - (y2 - y1) * 0.2, GRID)
+        grid = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        return np.concatenate([np.asarray(kps, dtype=np.float64).reshape(-1, 2), grid])
@@ -0,0 +1,207 @@
+"""
+Frame Sampler
+Decodes only the frames face detection actually looks at
+- opencv: grab() skips frames without converting them; long strides seek instead
+- ffmpeg: a pipe that outputs just the sampled frames, already scaled to detector size
+"""
+
+import itertools
+import json
+import os
+import subprocess
+import tempfile
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DECODERS = ("opencv", "ffmpeg")
+
+# Strides at least this long seek instead of grabbing every frame in between
+# (a seek decodes forward from the previous keyframe, so it only pays off past ~one GOP)
+SEEK_MIN_STRIDE = int(os.getenv("FACE_SEEK_MIN_STRIDE", "60"))
+
+# Longest ffmpeg select expression passed on the command line (Linux caps one argument
+# at 128 KiB); longer sampling plans decode every frame and drop the unplanned ones
+MAX_SELECT_EXPRESSION = 100_000
+
+
+class FrameSampler:
+    """
+    Iterates (frame_number, frame) over every stride-th frame of a video
+    Frame numbers always refer to the source's frame index. scale_x/scale_y map
+    pixel coordinates in the yielded frames back to source pixels.
+    Setting segments to (first frame, last frame, stride) ranges before iterating
+    replaces the uniform stride, e.g. a sampling plan built per shot.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        frame_sampling: int = 1,
+        samples_per_second: Optional[float] = None,
+        decoder: str = "opencv",
+        max_side: Optional[int] = None,
+    ):
+        if decoder not in DECODERS:
+            raise ValueError(f"Unknown decoder: {decoder}")
+        self.source = source
+        self.decoder = decoder
+        self._cap = None
+
+        if decoder == "opencv":
+            self._cap = cv2.VideoCapture(source)
+            self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+            self.total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        else:
+            self.fps, self.total_frames, self.width, self.height = self._probe(source)
+
+        # Time-based sampling ("2 samples per second") overrides a fixed frame stride
+        if samples_per_second and self.fps > 0:
+            self.stride = max(int(round(self.fps / samples_per_second)), 1)
+        else:
+            self.stride = max(int(frame_sampling or 1), 1)
+        self.segments: Optional[List[Tuple[int, int, int]]] = None
+
+        # Only the ffmpeg pipe downscales; OpenCV frames come out at source size
+        self.out_width, self.out_height = self.width, self.height
+        if decoder == "ffmpeg" and max_side and max(self.width, self.height) > max_side:
+            ratio = max_side / max(self.width, self.height)
+            self.out_width = max(int(round(self.width * ratio / 2)) * 2, 2)
+            self.out_height = max(int(round(self.height * ratio / 2)) * 2, 2)
+        self.scale_x = self.width / self.out_width if self.out_width else 1.0
+        self.scale_y = self.height / self.out_height if self.out_height else 1.0
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        if self.decoder == "ffmpeg":
+            return self._iter_ffmpeg()
+        if self._min_stride() >= SEEK_MIN_STRIDE and self.total_frames > 0:
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def frame_numbers(self) -> Iterator[int]:
+        """Source frame numbers to sample, in order"""
+        if self.segments is None:
+            return iter(range(0, self.total_frames, self.stride))
+        return (n for first, last, stride in self.segments for n in range(first, last + 1, max(stride, 1)))
+
+    def _min_stride(self) -> int:
+        if self.segments is None:
+            return self.stride
+        return min((max(stride, 1) for _, _, stride in self.segments), default=self.stride)
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _iter_grab(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Demux every frame but only convert the sampled ones"""
+        planned = set(self.frame_numbers()) if self.segments is not None else None
+        frame_number = 0
+        while self._cap.grab():
+            if frame_number % self.stride == 0 if planned is None else frame_number in planned:
+                ok, frame = self._cap.retrieve()
+                if not ok:
+                    break
+                yield frame_number, frame
+            frame_number += 1
+
+    def _iter_seek(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Jump straight to each sampled frame"""
+        for frame_number in self.frame_numbers():
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ok, frame = self._cap.read()
+            if not ok:
+                break
+            yield frame_number, frame
+
+    def _iter_ffmpeg(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Raw BGR frames from ffmpeg's select/scale filters (one output frame per sample)"""
+        planned = None  # Frames to keep in Python when the plan is too long for the filter
+        if self.segments is None:
+            filters = [f"select=not(mod(n\\,{self.stride}))"]
+            numbers = (sample * self.stride for sample in itertools.count())
+        else:
+            expression = "+".join(
+                f"between(n\\,{first}\\,{last})*not(mod(n-{first}\\,{max(stride, 1)}))"
+                for first, last, stride in self.segments
+            )
+            if len(expression) <= MAX_SELECT_EXPRESSION:
+                filters = [f"select={expression or 0}"]
+                numbers = self.frame_numbers()
+            else:
+                filters = []
+                numbers = itertools.count()
+                planned = set(self.frame_numbers())
+        if (self.out_width, self.out_height) != (self.width, self.height):
+            filters.append(f"scale={self.out_width}:{self.out_height}:flags=area")
+        # Errors go to a file: a corrupt input can log more than a pipe buffer holds,
+        # which would block ffmpeg while we wait on stdout
+        error_log = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-loglevel", "error", "-nostdin",
+                "-i", self.source,
+                "-map", "0:v:0",
+                "-vf", ",".join(filters) or "null",
+                "-fps_mode", "passthrough",
+                "-f", "rawvideo", "-pix_fmt", "bgr24",
+                "pipe:",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=error_log,
+        )
+        frame_size = self.out_width * self.out_height * 3
+        try:
+            for frame_number in numbers:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                if planned is not None and frame_number not in planned:
+                    continue
+                frame = np.frombuffer(data, np.uint8).reshape(self.out_height, self.out_width, 3)
+                yield frame_number, frame
+            process.stdout.read()  # Past the end of a sampling plan: let ffmpeg finish
+            if process.wait() != 0:
+                error_log.seek(0)
+                raise RuntimeError(f"ffmpeg decode failed: {error_log.read().decode(errors='replace').strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            error_log.close()
+
+    @staticmethod
+    def _probe(source: str) -> Tuple[float, int, int, int]:
+        """(fps, frame count, width, height) of the first video stream, as displayed"""
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "v:0",
+                "-show_streams", "-show_format",
+                "-of", "json",
+                source,
+            ],
+            capture_output=True,
+            check=True,
+        )
+        probe = json.loads(result.stdout)
+        stream = probe["streams"][0]
+        num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+        fps = float(num) / float(den) if den and float(den) else 0.0
+        total_frames = int(stream.get("nb_frames") or 0)
+        if not total_frames and fps > 0:
+            total_frames = int(float(probe.get("format", {}).get("duration") or 0) * fps)
+
+        # ffmpeg auto-rotates, so a +-90 degree display matrix swaps the output size
+        width, height = int(stream["width"]), int(stream["height"])
+        rotation = int(float(stream.get("tags", {}).get("rotate", 0)))
+        for side_data in stream.get("side_data_list", []):
+            rotation = int(side_data.get("rotation", rotation))
+        if abs(rotation) % 180 == 90:
+            width, height = height, width
+        return fps, total_frames, width, height
@@ -6,9 +6,10 @@ Phase 1: Detection only - no transformation yet
 """
 
 import os
+import threading
 import uuid
 import json
-from typing import Optional, List, Dict
+from typing import Callable, Iterable, Optional, List, Dict, Tuple
 from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
 from pydantic import BaseModel
 import boto3
@@ -18,6 +19,13 @@ import numpy as np
 import insightface
 from insightface.app import FaceAnalysis
 
+from common.asset_cache import cache_from_env, download_dir
+from face_pipeline import FACE_ADAPTIVE_MAX_SIDE, FacePipeline, tune_sessions
+from frame_sampler import DECODERS, FrameSampler
+from common.job_runner import runner_from_env
+from common.s3_transfer import presign_s3_url, transfer_config_from_env
+from scene_detector import ANALYSIS_SIDE, SCENE_THRESHOLD, Shot, detect_shots, sampling_plan
+
 app = FastAPI(title="Face Transformer Worker")
 
 # S3 client
@@ -33,13 +41,42 @@ BUCKET = os.getenv("S3_BUCKET", "video-ai-platform")
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:3001")
 WORKER_API_KEY = os.getenv("WORKER_API_KEY", "")
 
+# Read source videos straight from presigned S3 URLs instead of downloading them first
+S3_STREAM_SOURCES = os.getenv("S3_STREAM_SOURCES", "false").lower() == "true"
+
 # InsightFace model cache
 face_models = {}
+face_models_lock = threading.Lock()  # Concurrent jobs load each model once
 default_model = os.getenv("INSIGHTFACE_MODEL", "buffalo_l")  # or "buffalo_s" for smaller
+DETECTION_SIZE = 640  # Detector input size (longest side)
+
+# Frame decoder: "ffmpeg" (pipe of sampled frames at detection size) or "opencv" (grab/seek)
+FACE_DECODER = os.getenv("FACE_DECODER", "ffmpeg")
+
+# Adaptive resolution: re-detect at higher resolution where small faces are expected
+FACE_ADAPTIVE = os.getenv("FACE_ADAPTIVE", "false").lower() == "true"
+
+# Run the detector on every Nth sample and track faces with optical flow in between (1 = off)
+FACE_DETECT_INTERVAL = int(os.getenv("FACE_DETECT_INTERVAL", "1"))
+
+# Scene-cut pre-pass: sample per shot, detect at every cut and end tracks there
+FACE_SCENE_DETECTION = os.getenv("FACE_SCENE_DETECTION", "false").lower() == "true"
+
+# Multipart part size / concurrency for S3 transfers (S3_PART_SIZE_MB, S3_PART_CONCURRENCY)
+transfer_config = transfer_config_from_env()
+
+# Node-local asset cache shared with the other workers (ASSET_CACHE_DIR)
+asset_cache = cache_from_env(s3_client, transfer_config)
+
+# Downloads go next to the cache (same filesystem), so cache hits are hard links
+DOWNLOAD_DIR = download_dir(asset_cache)
 
 # In-memory job tracking
 jobs = {}
 
+# Decoding and inference run on a thread pool (JOB_CONCURRENCY jobs at once)
+job_runner = runner_from_env(default_jobs=1)
+
 
 class ExecuteRequest(BaseModel):
     jobId: str
@@ -55,15 +92,20 @@ class ExecuteResponse(BaseModel):
 
 def get_face_model(model_name: str = "buffalo_l"):
     """Get or load InsightFace model"""
-    if model_name not in face_models:
-        print(f"Loading InsightFace model: {model_name}")
-        face_models[model_name] = FaceAnalysis(
-            name=model_name,
-            providers=["CUDAExecutionProvider", "CPUExecutionProvider"],
-        )
-        face_models[model_name].prepare(ctx_id=0, det_size=(640, 640))
-        print(f"Model loaded successfully")
-    return face_models[model_name]
+    with face_models_lock:
+        if model_name not in face_models:
+            print(f"Loading InsightFace model: {model_name}")
+            # Only detection + recognition: landmark/attribute models aren't part of the output
+            model = FaceAnalysis(
+                name=model_name,
+                providers=["CUDAExecutionProvider", "CPUExecutionProvider"],
+                allowed_modules=["detection", "recognition"],
+            )
+            model.prepare(ctx_id=0, det_size=(DETECTION_SIZE, DETECTION_SIZE))
+            tune_sessions(model)
+            face_models[model_name] = model
+            print(f"Model loaded successfully")
+        return face_models[model_name]
 
 
 def download_from_s3(s3_path: str, local_path: str):
@@ -75,28 +117,39 @@ def download_from_s3(s3_path: str, local_path: str):
     bucket = path_parts[0]
     key = path_parts[1] if len(path_parts) > 1 else ""
 
-    s3_client.download_file(bucket, key, local_path)
+    if asset_cache:
+        asset_cache.download(s3_path, local_path)
+    else:
+        s3_client.download_file(bucket, key, local_path, Config=transfer_config)
 
 
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """Upload file to S3 and return S3 path"""
     try:
-        s3_client.upload_file(file_path, BUCKET, s3_key)
+        s3_client.upload_file(file_path, BUCKET, s3_key, Config=transfer_config)
         return f"s3://{BUCKET}/{s3_key}"
     except ClientError as e:
         raise Exception(f"Failed to upload to S3: {e}")
 
 
-def track_faces(detections: List[List[Dict]], frame_sampling: int = 1):
+def track_faces(detections: List[Dict], cuts: Iterable[int] = ()):
     """
     Simple face tracking by matching embeddings across frames
+    Tracks end at scene cuts (first frames of shots): a face after a cut starts a new track
     Returns (track_assignments, tracks) tuple
     """
     tracks = {}
+    active = []  # Tracks faces can still join (the current shot's)
     track_counter = 0
-
-    for frame_idx, frame_detections in enumerate(detections):
-        for face in frame_detections:
+    cuts = sorted(cuts)
+    next_cut = 0
+
+    for detection in detections:
+        frame_idx = detection["frameNumber"]  # Source frame number
+        while next_cut < len(cuts) and frame_idx >= cuts[next_cut]:
+            active.clear()
+            next_cut += 1
+        for face in detection["faces"]:
             embedding = face.get("embedding")
             if not embedding:
                 continue
@@ -108,8 +161,8 @@ def track_faces(detections: List[List[Dict]], frame_sampling: int = 1):
             best_distance = float("inf")
             threshold = 0.6  # Cosine similarity threshold
 
-            for track_id, track_data in tracks.items():
-                avg_embedding = track_data["avg_embedding"]
+            for track_id in active:
+                avg_embedding = tracks[track_id]["avg_embedding"]
                 # Cosine distance
                 distance = 1 - np.dot(embedding, avg_embedding) / (
                     np.linalg.norm(embedding) * np.linalg.norm(avg_embedding)
@@ -137,12 +190,96 @@ def track_faces(detections: List[List[Dict]], frame_sampling: int = 1):
                     "avg_embedding": embedding,
                     "start_frame": frame_idx,
                 }
+                active.append(track_id)
 
             face["trackId"] = track_id
 
     return tracks
 
 
+def find_shots(source: str, decoder: str, threshold: float = SCENE_THRESHOLD) -> List[Shot]:
+    """Scene-cut pre-pass over every frame, decoded at analysis size (blocking)"""
+    scan = FrameSampler(source, 1, decoder=decoder, max_side=ANALYSIS_SIDE)
+    try:
+        return detect_shots(scan, threshold)
+    finally:
+        scan.close()
+
+
+def detect_faces(
+    sampler: FrameSampler,
+    model,
+    min_confidence: float,
+    on_progress: Callable[[int], None],
+    adaptive: bool = False,
+    detect_interval: int = 1,
+    cuts: Iterable[int] = (),
+) -> Tuple[List[Dict], FacePipeline]:
+    """
+    Detect faces on the sampler's frames (blocking - run on the job pool)
+    Decoding, detection and batched embedding run as a pipeline (face_pipeline.py);
+    on_progress gets 30-80 as frames are processed.
+    Returns (detections, the finished pipeline for its frame counters)
+    """
+    # Detection-space -> source-pixel factors for [x1, y1, x2, y2] boxes and (x, y) points
+    box_scale = np.array([sampler.scale_x, sampler.scale_y, sampler.scale_x, sampler.scale_y])
+    point_scale = np.array([sampler.scale_x, sampler.scale_y])
+    fps = sampler.fps
+    total_frames = sampler.total_frames
+    detections = []
+    last_progress = None
+
+    print(
+        f"Processing video: {total_frames} frames at {fps} fps, "
+        f"every {sampler.stride} frame(s) via {sampler.decoder}"
+    )
+
+    pipeline = FacePipeline(
+        model, min_score=min_confidence, adaptive=adaptive, detect_interval=detect_interval, cuts=cuts
+    )
+    for frame_number, faces in pipeline.run(sampler):
+        frame_detections = []
+        for face in faces:
+            # Back to source pixels if the decoder downscaled the frame
+            bbox = np.round(face.bbox * box_scale).astype(int)
+            landmark = face.kps * point_scale
+            embedding = face.embedding.tolist() if face.embedding is not None else None
+
+            frame_detections.append({
+                "boundingBox": {
+                    "x": int(bbox[0]),
+                    "y": int(bbox[1]),
+                    "width": int(bbox[2] - bbox[0]),
+                    "height": int(bbox[3] - bbox[1]),
+                },
+                "confidence": float(face.det_score),
+                "source": face.source,  # "detected" or "tracked" (carried by optical flow)
+                "embedding": embedding,
+                "landmarks": {
+                    "leftEye": {"x": float(landmark[0][0]), "y": float(landmark[0][1])},
+                    "rightEye": {"x": float(landmark[1][0]), "y": float(landmark[1][1])},
+                    "nose": {"x": float(landmark[2][0]), "y": float(landmark[2][1])},
+                    "mouthLeft": {"x": float(landmark[3][0]), "y": float(landmark[3][1])},
+                    "mouthRight": {"x": float(landmark[4][0]), "y": float(landmark[4][1])},
+                },
+            })
+
+        detections.append({
+            "frameNumber": frame_number,
+            "timestamp": frame_number / fps if fps > 0 else 0,
+            "faces": frame_detections,
+        })
+
+        # Update progress (only when it changes, not once per frame)
+        # Frame count can be unknown (0) for streamed sources
+        progress = 30 + min(int((frame_number / max(total_frames, 1)) * 50), 50)
+        if progress != last_progress:
+            on_progress(progress)
+            last_progress = progress
+
+    return detections, pipeline
+
+
 async def process_face_detection(
     job_id: str,
     clip_id: str,
@@ -151,94 +288,72 @@ async def process_face_detection(
     min_confidence: float,
     user_id: str,
     project_id: Optional[str],
+    samples_per_second: Optional[float] = None,
+    decoder: str = FACE_DECODER,
+    adaptive: bool = FACE_ADAPTIVE,
+    detect_interval: int = FACE_DETECT_INTERVAL,
+    scene_detection: bool = FACE_SCENE_DETECTION,
+    scene_threshold: float = SCENE_THRESHOLD,
 ):
     """Process face detection in background"""
+    sampler = None
     try:
         # Update status to processing
         jobs[job_id] = {"status": "processing", "progress": 10}
         await update_backend_status(job_id, 10, "processing")
 
-        # Download video from S3
-        local_video = f"/tmp/video_{uuid.uuid4()}.mp4"
-        download_from_s3(video_path, local_video)
+        # Download video from S3 (or stream it: OpenCV's FFmpeg backend reads URLs)
+        if S3_STREAM_SOURCES:
+            local_video = None
+            video_source = presign_s3_url(s3_client, video_path)
+        else:
+            local_video = os.path.join(DOWNLOAD_DIR, f"video_{uuid.uuid4()}.mp4")
+            await job_runner.run(download_from_s3, video_path, local_video)
+            video_source = local_video
         jobs[job_id]["progress"] = 20
         await update_backend_status(job_id, 20, "processing")
 
         # Load InsightFace model
-        model = get_face_model(default_model)
+        model = await job_runner.run(get_face_model, default_model)
         jobs[job_id]["progress"] = 30
         await update_backend_status(job_id, 30, "processing")
 
-        # Open video
-        cap = cv2.VideoCapture(local_video)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Decode + detect on the job pool, reporting progress from the worker thread
+        notify = job_runner.threadsafe(update_backend_status)
+
+        def report_progress(progress: int):
+            jobs[job_id]["progress"] = progress
+            notify(job_id, progress, "processing")
+
+        # The ffmpeg decoder delivers frames at detection size, or at up to
+        # FACE_ADAPTIVE_MAX_SIDE when the adaptive pass needs more detail
+        max_side = FACE_ADAPTIVE_MAX_SIDE if adaptive else DETECTION_SIZE
+        sampler = await job_runner.run(
+            FrameSampler, video_source, frame_sampling, samples_per_second, decoder, max_side
+        )
+        shots = []
+        if scene_detection:
+            shots = await job_runner.run(find_shots, video_source, decoder, scene_threshold)
+            # Sample every shot from its first frame; static shots more sparsely
+            if shots:
+                sampler.segments = sampling_plan(shots, sampler.stride)
+            print(f"Found {len(shots)} shot(s)")
+        cuts = [shot.start for shot in shots[1:]]
+        detections, pipeline = await job_runner.run(
+            detect_faces, sampler, model, min_confidence, report_progress, adaptive, detect_interval, cuts
+        )
+        sampler.close()
+        fps = sampler.fps
+        total_frames = sampler.total_frames
+        frame_sampling = sampler.stride
         duration = total_frames / fps if fps > 0 else 0
 
-        frame_sampling = frame_sampling or 1
-        detections = []
-        frame_number = 0
-
-        print(f"Processing video: {total_frames} frames at {fps} fps")
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # Sample frames
-            if frame_number % frame_sampling == 0:
-                # Detect faces
-                faces = model.get(frame)
-
-                frame_detections = []
-                for face in faces:
-                    if face.det_score < min_confidence:
-                        continue
-
-                    bbox = face.bbox.astype(int)
-                    embedding = face.embedding.tolist()
-
-                    frame_detections.append({
-                        "boundingBox": {
-                            "x": int(bbox[0]),
-                            "y": int(bbox[1]),
-                            "width": int(bbox[2] - bbox[0]),
-                            "height": int(bbox[3] - bbox[1]),
-                        },
-                        "confidence": float(face.det_score),
-                        "embedding": embedding,
-                        "landmarks": {
-                            "leftEye": {"x": float(face.landmark[0][0]), "y": float(face.landmark[0][1])},
-                            "rightEye": {"x": float(face.landmark[1][0]), "y": float(face.landmark[1][1])},
-                            "nose": {"x": float(face.landmark[2][0]), "y": float(face.landmark[2][1])},
-                            "mouthLeft": {"x": float(face.landmark[3][0]), "y": float(face.landmark[3][1])},
-                            "mouthRight": {"x": float(face.landmark[4][0]), "y": float(face.landmark[4][1])},
-                        },
-                    })
-
-                detections.append({
-                    "frameNumber": frame_number,
-                    "timestamp": frame_number / fps if fps > 0 else 0,
-                    "faces": frame_detections,
-                })
-
-                # Update progress
-                progress = 30 + int((frame_number / total_frames) * 50)
-                jobs[job_id]["progress"] = progress
-                await update_backend_status(job_id, progress, "processing")
-
-            frame_number += 1
-
-        cap.release()
         jobs[job_id]["progress"] = 80
         await update_backend_status(job_id, 80, "processing")
 
         # Track faces across frames
         print("Tracking faces across frames...")
-        # Convert detections to list of frame detections for tracking
-        frame_detections_list = [d["faces"] for d in detections]
-        tracks = track_faces(frame_detections_list, frame_sampling)
+        tracks = await job_runner.run(track_faces, detections, cuts)
         
         # Update detections with track IDs
         frame_idx = 0
@@ -267,11 +382,15 @@ async def process_face_detection(
                 },
             })
 
+        # Shot list (scene cuts), also stored on its own for reuse, e.g. by the renderer
+        shots_output = [shot.to_dict(index, fps) for index, shot in enumerate(shots)]
+
         # Prepare output
         output_data = {
             "videoPath": video_path,
             "detections": detections,
             "tracks": tracks_output,
+            "shots": shots_output,
             "metadata": {
                 "totalFrames": total_frames,
                 "fps": fps,
@@ -282,6 +401,15 @@ async def process_face_detection(
                 "detectionConfig": {
                     "minConfidence": min_confidence,
                     "frameSampling": frame_sampling,
+                    "samplesPerSecond": samples_per_second,
+                    "decoder": decoder,
+                    "adaptiveResolution": adaptive,
+                    "highResolutionFrames": pipeline.detail_frames,
+                    "detectEvery": pipeline.detect_interval,
+                    "detectedFrames": pipeline.detected_frames,
+                    "trackedFrames": pipeline.tracked_frames,
+                    "sceneDetection": scene_detection,
+                    "sceneThreshold": scene_threshold if scene_detection else None,
                 },
             },
         }
@@ -289,14 +417,29 @@ async def process_face_detection(
         # Save JSON to file
         json_path = f"/tmp/detections_{uuid.uuid4()}.json"
         with open(json_path, "w") as f:
-            json.dump(output_data, f, indent=2)
+            await job_runner.run(json.dump, output_data, f, indent=2)
 
         # Upload to S3
         s3_key = f"users/{user_id}/projects/{project_id or 'temp'}/metadata/face_detections_{uuid.uuid4()}.json"
-        s3_path = upload_to_s3(json_path, s3_key)
+        s3_path = await job_runner.run(upload_to_s3, json_path, s3_key)
+
+        shots_s3_path = None
+        if shots:
+            shots_path = f"/tmp/shots_{uuid.uuid4()}.json"
+            shots_data = {
+                "videoPath": video_path,
+                "fps": fps,
+                "totalFrames": total_frames,
+                "shots": shots_output,
+            }
+            with open(shots_path, "w") as f:
+                await job_runner.run(json.dump, shots_data, f, indent=2)
+            shots_key = f"users/{user_id}/projects/{project_id or 'temp'}/metadata/shots_{uuid.uuid4()}.json"
+            shots_s3_path = await job_runner.run(upload_to_s3, shots_path, shots_key)
+            os.remove(shots_path)
 
         # Clean up
-        if os.path.exists(local_video):
+        if local_video and os.path.exists(local_video):
             os.remove(local_video)
         if os.path.exists(json_path):
             os.remove(json_path)
@@ -304,6 +447,7 @@ async def process_face_detection(
         # Prepare output
         output = {
             "filePath": s3_path,
+            "shotsPath": shots_s3_path,
             "facesDetected": output_data["metadata"]["facesDetected"],
             "uniqueTracks": len(tracks),
             "duration": duration,
@@ -318,6 +462,8 @@ async def process_face_detection(
         print(f"Error in face detection: {error_msg}")
         import traceback
         traceback.print_exc()
+        if sampler:
+            sampler.close()
         jobs[job_id] = {"status": "failed", "progress": 0, "error": error_msg}
         await update_backend_status(job_id, 0, "failed", None, error_msg)
 
@@ -371,6 +517,14 @@ async def execute(
         )
 
     frame_sampling = request.input.get("frameSampling", 1)  # Process every Nth frame
+    samples_per_second = request.input.get("sampleRate")  # Or N frames per second of video
+    decoder = request.input.get("decoder", FACE_DECODER)
+    if decoder not in DECODERS:
+        raise HTTPException(status_code=400, detail=f"Unknown decoder: {decoder}")
+    adaptive = bool(request.input.get("adaptiveResolution", FACE_ADAPTIVE))
+    detect_interval = int(request.input.get("detectEvery", FACE_DETECT_INTERVAL))
+    scene_detection = bool(request.input.get("sceneDetection", FACE_SCENE_DETECTION))
+    scene_threshold = float(request.input.get("sceneThreshold", SCENE_THRESHOLD))
     min_confidence = request.input.get("minConfidence", 0.5)
     user_id = request.input.get("userId", "unknown")
     project_id = request.input.get("projectId")
@@ -378,6 +532,7 @@ async def execute(
     # Phase 1: Detection only (no transformation)
     # Start background task
     background_tasks.add_task(
+        job_runner.submit,
         process_face_detection,
         request.jobId,
         clip_id,
@@ -386,6 +541,12 @@ async def execute(
         min_confidence,
         user_id,
         project_id,
+        samples_per_second,
+        decoder,
+        adaptive,
+        detect_interval,
+        scene_detection,
+        scene_threshold,
     )
 
     return ExecuteResponse(jobId=request.jobId, status="accepted")
@@ -401,6 +562,7 @@ async def health():
         "gpu_available": False,  # InsightFace uses ONNX, GPU via ONNXRuntime
         "model_loaded": model_loaded,
         "model": default_model,
+        "jobs": job_runner.stats(),
         "version": "1.0.0",
         "phase": "detection_only",  # Phase 1: Detection only
     }
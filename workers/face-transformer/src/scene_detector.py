@@ -0,0 +1,125 @@
+"""
+Scene Detector
+Splits a video into shots from a cheap pre-pass over tiny luma frames
+- cut score: histogram distance between consecutive frames, confirmed by their SAD
+- motion: mean luma change per frame within a shot (static shots can be sampled sparsely)
+Scores are computed a chunk of frames at a time with NumPy.
+"""
+
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import cv2
+import numpy as np
+
+# Histogram distance (0-1) between consecutive frames that counts as a cut
+SCENE_THRESHOLD = float(os.getenv("FACE_SCENE_THRESHOLD", "0.35"))
+
+# Shortest shot, in frames; stops flashes and fast pans producing runs of cuts
+SCENE_MIN_SHOT_FRAMES = int(os.getenv("FACE_SCENE_MIN_SHOT_FRAMES", "8"))
+
+# Shots moving less than this (mean absolute luma change per frame, 0-1) are static,
+# and are sampled FACE_SCENE_STATIC_FACTOR times more sparsely
+SCENE_STATIC_MOTION = float(os.getenv("FACE_SCENE_STATIC_MOTION", "0.01"))
+SCENE_STATIC_FACTOR = int(os.getenv("FACE_SCENE_STATIC_FACTOR", "4"))
+
+ANALYSIS_SIDE = 64  # Frames are compared as ANALYSIS_SIDE x ANALYSIS_SIDE luma
+HIST_BINS = 32
+MIN_CUT_SAD = 0.05  # A cut also changes the pixels, not just the histogram (e.g. a fade)
+CHUNK_FRAMES = 512
+
+
+class Shot:
+    """Frames first..last (inclusive) of one continuous shot"""
+
+    __slots__ = ("start", "end", "motion")
+
+    def __init__(self, start: int, end: int, motion: float):
+        self.start = start
+        self.end = end
+        self.motion = motion
+
+    @property
+    def static(self) -> bool:
+        return self.motion < SCENE_STATIC_MOTION
+
+    def to_dict(self, index: int, fps: float) -> Dict:
+        return {
+            "shotIndex": index,
+            "startFrame": self.start,
+            "endFrame": self.end,
+            "startTime": self.start / fps if fps > 0 else 0,
+            "endTime": (self.end + 1) / fps if fps > 0 else 0,
+            "motion": round(self.motion, 4),
+            "static": self.static,
+        }
+
+
+def detect_shots(
+    frames: Iterable[Tuple[int, np.ndarray]],
+    threshold: float = SCENE_THRESHOLD,
+    min_shot_frames: int = SCENE_MIN_SHOT_FRAMES,
+) -> List[Shot]:
+    """Shots of consecutive (frame_number, BGR frame) pairs (blocking - run on the job pool)"""
+    numbers: List[int] = []
+    hist_diff: List[np.ndarray] = []
+    sad: List[np.ndarray] = []
+    chunk: List[np.ndarray] = []
+    previous = None  # Last frame of the previous chunk, to diff across the boundary
+
+    def score(chunk_frames: List[np.ndarray]):
+        nonlocal previous
+        luma = np.stack(chunk_frames if previous is None else [previous] + chunk_frames)
+        previous = luma[-1]
+        pixels = luma.reshape(len(luma), -1)
+        # One bincount for all histograms: offset each frame's bins by its row
+        bins = (pixels // (256 // HIST_BINS)).astype(np.int64)
+        bins += np.arange(len(pixels))[:, None] * HIST_BINS
+        hist = np.bincount(bins.ravel(), minlength=len(pixels) * HIST_BINS).reshape(-1, HIST_BINS)
+        hist = hist / pixels.shape[1]
+        hist_diff.append(0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1))
+        sad.append(np.abs(np.diff(pixels.astype(np.int16), axis=0)).mean(axis=1) / 255)
+
+    for frame_number, frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        chunk.append(cv2.resize(gray, (ANALYSIS_SIDE, ANALYSIS_SIDE), interpolation=cv2.INTER_AREA))
+        numbers.append(frame_number)
+        if len(chunk) >= CHUNK_FRAMES:
+            score(chunk)
+            chunk = []
+    if chunk:
+        score(chunk)
+    if not numbers:
+        return []
+
+    # Entry i compares frame i + 1 with frame i
+    hist_diff_all = np.concatenate(hist_diff) if hist_diff else np.zeros(0)
+    sad_all = np.concatenate(sad) if sad else np.zeros(0)
+    candidates = np.flatnonzero((hist_diff_all >= threshold) & (sad_all >= MIN_CUT_SAD)) + 1
+
+    starts = [0]
+    for i in candidates:
+        if i - starts[-1] >= min_shot_frames:
+            starts.append(int(i))
+    bounds = starts + [len(numbers)]
+
+    shots = []
+    for first, stop in zip(bounds, bounds[1:]):
+        # Motion within the shot excludes the cut into it
+        motion = float(sad_all[first:stop - 1].mean()) if stop - first > 1 else 0.0
+        shots.append(Shot(numbers[first], numbers[stop - 1], motion))
+    return shots
+
+
+def sampling_plan(
+    shots: List[Shot], stride: int, static_factor: int = SCENE_STATIC_FACTOR
+) -> List[Tuple[int, int, int]]:
+    """
+    (first frame, last frame, stride) per shot for FrameSampler.segments: every
+    shot's first frame is sampled, static shots static_factor times more sparsely
+    """
+    stride = max(stride, 1)
+    return [
+        (shot.start, shot.end, stride * max(static_factor, 1) if shot.static else stride)
+        for shot in shots
+    ]
@@ -5,8 +5,9 @@ Uses Whisper (OpenAI) or faster-whisper for speech-to-text and subtitle generati
 """
 
 import os
+import threading
 import uuid
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
 from pydantic import BaseModel
 import boto3
@@ -17,6 +18,10 @@ from faster_whisper import WhisperModel
 import srt
 from datetime import timedelta
 
+from common.asset_cache import cache_from_env, download_dir
+from common.job_runner import runner_from_env
+from common.s3_transfer import presign_s3_url, transfer_config_from_env
+
 app = FastAPI(title="Subtitle Generator Worker")
 
 # S3 client
@@ -32,15 +37,31 @@ BUCKET = os.getenv("S3_BUCKET", "video-ai-platform")
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:3001")
 WORKER_API_KEY = os.getenv("WORKER_API_KEY", "")
 
+# Read source videos straight from presigned S3 URLs instead of downloading them first
+S3_STREAM_SOURCES = os.getenv("S3_STREAM_SOURCES", "false").lower() == "true"
+
 # Whisper model cache
 whisper_models = {}
+whisper_models_lock = threading.Lock()  # Concurrent jobs load each model once
 device = "cuda" if torch.cuda.is_available() else "cpu"
 use_faster_whisper = os.getenv("USE_FASTER_WHISPER", "true").lower() == "true"
 default_model = os.getenv("WHISPER_MODEL", "base")
 
+# Multipart part size / concurrency for S3 transfers (S3_PART_SIZE_MB, S3_PART_CONCURRENCY)
+transfer_config = transfer_config_from_env()
+
+# Node-local asset cache shared with the other workers (ASSET_CACHE_DIR)
+asset_cache = cache_from_env(s3_client, transfer_config)
+
+# Downloads go next to the cache (same filesystem), so cache hits are hard links
+DOWNLOAD_DIR = download_dir(asset_cache)
+
 # In-memory job tracking
 jobs = {}
 
+# Transcription runs on a thread pool (JOB_CONCURRENCY jobs at once)
+job_runner = runner_from_env(default_jobs=1)
+
 
 class ExecuteRequest(BaseModel):
     jobId: str
@@ -56,16 +77,17 @@ class ExecuteResponse(BaseModel):
 
 def get_whisper_model(model_name: str = "base"):
     """Get or load Whisper model"""
-    if model_name not in whisper_models:
-        print(f"Loading Whisper model: {model_name} on {device}")
-        if use_faster_whisper:
-            whisper_models[model_name] = WhisperModel(
-                model_name, device=device, compute_type="float16" if device == "cuda" else "int8"
-            )
-        else:
-            whisper_models[model_name] = whisper.load_model(model_name, device=device)
-        print(f"Model loaded successfully")
-    return whisper_models[model_name]
+    with whisper_models_lock:
+        if model_name not in whisper_models:
+            print(f"Loading Whisper model: {model_name} on {device}")
+            if use_faster_whisper:
+                whisper_models[model_name] = WhisperModel(
+                    model_name, device=device, compute_type="float16" if device == "cuda" else "int8"
+                )
+            else:
+                whisper_models[model_name] = whisper.load_model(model_name, device=device)
+            print(f"Model loaded successfully")
+        return whisper_models[model_name]
 
 
 def download_from_s3(s3_path: str, local_path: str):
@@ -77,13 +99,16 @@ def download_from_s3(s3_path: str, local_path: str):
     bucket = path_parts[0]
     key = path_parts[1] if len(path_parts) > 1 else ""
 
-    s3_client.download_file(bucket, key, local_path)
+    if asset_cache:
+        asset_cache.download(s3_path, local_path)
+    else:
+        s3_client.download_file(bucket, key, local_path, Config=transfer_config)
 
 
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """Upload file to S3 and return S3 path"""
     try:
-        s3_client.upload_file(file_path, BUCKET, s3_key)
+        s3_client.upload_file(file_path, BUCKET, s3_key, Config=transfer_config)
         return f"s3://{BUCKET}/{s3_key}"
     except ClientError as e:
         raise Exception(f"Failed to upload to S3: {e}")
@@ -109,6 +134,28 @@ def generate_srt(segments: List[dict], output_path: str):
         f.write(srt.compose(subtitles))
 
 
+def transcribe(model, audio_path: str, language: Optional[str], translate: bool) -> Tuple[str, List[dict]]:
+    """
+    Run Whisper over the audio (blocking - run on the job pool)
+    Returns (detected language, segments); faster-whisper decodes lazily,
+    so its segment generator is consumed here too
+    """
+    if use_faster_whisper:
+        segments, info = model.transcribe(
+            audio_path,
+            language=language,
+            task="translate" if translate else "transcribe",
+        )
+        segments_list = [
+            {"start": seg.start, "end": seg.end, "text": seg.text}
+            for seg in segments
+        ]
+        return info.language, segments_list
+
+    result = model.transcribe(audio_path, language=language)
+    return result["language"], result["segments"]
+
+
 async def process_subtitle_generation(
     job_id: str,
     clip_id: str,
@@ -124,38 +171,31 @@ async def process_subtitle_generation(
         jobs[job_id] = {"status": "processing", "progress": 10}
         await update_backend_status(job_id, 10, "processing")
 
-        # Download video from S3
-        local_video = f"/tmp/video_{uuid.uuid4()}.mp4"
-        download_from_s3(video_path, local_video)
+        # Download video from S3 (or stream it: Whisper decodes through ffmpeg, which reads URLs)
+        if S3_STREAM_SOURCES:
+            local_video = None
+            video_source = presign_s3_url(s3_client, video_path)
+        else:
+            local_video = os.path.join(DOWNLOAD_DIR, f"video_{uuid.uuid4()}.mp4")
+            await job_runner.run(download_from_s3, video_path, local_video)
+            video_source = local_video
         jobs[job_id]["progress"] = 20
         await update_backend_status(job_id, 20, "processing")
 
         # Extract audio (simplified - in production use ffmpeg-python)
         # For now, assume video_path is actually audio or video with audio
-        audio_path = local_video  # TODO: Extract audio track
+        audio_path = video_source  # TODO: Extract audio track
 
         # Load Whisper model
-        model = get_whisper_model(default_model)
+        model = await job_runner.run(get_whisper_model, default_model)
         jobs[job_id]["progress"] = 30
         await update_backend_status(job_id, 30, "processing")
 
         # Transcribe
         print(f"Transcribing audio: language={language}")
-        if use_faster_whisper:
-            segments, info = model.transcribe(
-                audio_path,
-                language=language,
-                task="translate" if translate_to else "transcribe",
-            )
-            detected_language = info.language
-            segments_list = [
-                {"start": seg.start, "end": seg.end, "text": seg.text}
-                for seg in segments
-            ]
-        else:
-            result = model.transcribe(audio_path, language=language)
-            detected_language = result["language"]
-            segments_list = result["segments"]
+        detected_language, segments_list = await job_runner.run(
+            transcribe, model, audio_path, language, bool(translate_to)
+        )
 
         jobs[job_id]["progress"] = 70
         await update_backend_status(job_id, 70, "processing")
@@ -166,7 +206,7 @@ async def process_subtitle_generation(
 
         # Upload to S3
         s3_key = f"users/{user_id}/projects/{project_id or 'temp'}/metadata/{uuid.uuid4()}.srt"
-        s3_path = upload_to_s3(srt_path, s3_key)
+        s3_path = await job_runner.run(upload_to_s3, srt_path, s3_key)
         jobs[job_id]["progress"] = 90
         await update_backend_status(job_id, 90, "processing")
 
@@ -177,7 +217,7 @@ async def process_subtitle_generation(
             pass
 
         # Clean up local files
-        if os.path.exists(local_video):
+        if local_video and os.path.exists(local_video):
             os.remove(local_video)
         if os.path.exists(srt_path):
             os.remove(srt_path)
@@ -256,6 +296,7 @@ async def execute(
 
     # Start background task
     background_tasks.add_task(
+        job_runner.submit,
         process_subtitle_generation,
         request.jobId,
         clip_id,
@@ -282,6 +323,7 @@ async def health():
         "device": device,
         "model": default_model,
         "use_faster_whisper": use_faster_whisper,
+        "jobs": job_runner.stats(),
         "version": "1.0.0",
     }
 
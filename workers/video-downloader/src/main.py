@@ -14,6 +14,9 @@ import yt_dlp
 import boto3
 from botocore.exceptions import ClientError
 
+from common.job_runner import runner_from_env
+from common.s3_transfer import transfer_config_from_env
+
 app = FastAPI(title="Video Downloader Worker")
 
 # S3 configuration
@@ -39,9 +42,15 @@ else:
     print("WARNING: S3 environment variables not set! Uploads will fail.")
     s3_client = None
 
+# Multipart part size / concurrency for S3 uploads (S3_PART_SIZE_MB, S3_PART_CONCURRENCY)
+transfer_config = transfer_config_from_env()
+
 # In-memory job tracking (in production, use Redis)
 jobs = {}
 
+# yt-dlp downloads and S3 uploads run on a thread pool (JOB_CONCURRENCY jobs at once)
+job_runner = runner_from_env(default_jobs=4)
+
 
 class ExecuteRequest(BaseModel):
     jobId: str
@@ -86,7 +95,7 @@ def upload_to_s3(file_path: str, s3_key: str) -> str:
         raise Exception(f"File not found: {file_path}")
     try:
         print(f"Uploading {file_path} to s3://{BUCKET}/{s3_key}")
-        s3_client.upload_file(file_path, BUCKET, s3_key)
+        s3_client.upload_file(file_path, BUCKET, s3_key, Config=transfer_config)
         print(f"Upload successful: s3://{BUCKET}/{s3_key}")
         return f"s3://{BUCKET}/{s3_key}"
     except ClientError as e:
@@ -147,7 +156,7 @@ async def process_download(job_id: str, url: str, quality: str, format: str, use
 
         # Download video
         print(f"[Job {job_id}] Downloading video...")
-        video_info = download_video(url, quality, format)
+        video_info = await job_runner.run(download_video, url, quality, format)
         print(f"[Job {job_id}] Download complete: {video_info['file_path']}")
         jobs[job_id]["progress"] = 50
         await update_backend_status(job_id, 50, "processing")
@@ -156,7 +165,7 @@ async def process_download(job_id: str, url: str, quality: str, format: str, use
         platform = get_platform_from_url(url)
         s3_key = f"users/{user_id}/projects/{project_id or 'temp'}/source/{video_info['video_id']}.{video_info['ext']}"
         print(f"[Job {job_id}] Uploading to S3: {s3_key}")
-        s3_path = upload_to_s3(video_info["file_path"], s3_key)
+        s3_path = await job_runner.run(upload_to_s3, video_info["file_path"], s3_key)
         print(f"[Job {job_id}] Upload complete: {s3_path}")
 
         # Get file size before deleting
@@ -246,6 +255,7 @@ async def execute(
 
     # Start background task
     background_tasks.add_task(
+        job_runner.submit,
         process_download,
         request.jobId,
         url,
@@ -265,6 +275,7 @@ async def health():
         "status": "healthy",
         "gpu_available": False,  # This worker doesn't need GPU
         "model_loaded": True,
+        "jobs": job_runner.stats(),
         "version": "1.0.0",
     }
 
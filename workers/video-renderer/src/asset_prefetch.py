@@ -0,0 +1,55 @@
+"""
+Asset Prefetch
+Concurrent, de-duplicated S3 downloads for a render job
+Stages wait only for their own assets, so audio work can start while video is still downloading
+"""
+
+import os
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class AssetPrefetcher:
+    """Downloads S3 assets in a bounded thread pool, each distinct path once"""
+
+    def __init__(self, download: Callable[[str, str], None], temp_dir: str, max_workers: int):
+        self._download = download  # (s3_path, local_path) -> None
+        self.temp_dir = temp_dir
+        self._pool = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        self._futures: Dict[str, Future] = {}
+        self.local_paths: Dict[str, str] = {}  # S3 path -> local path
+
+    def prefetch(self, s3_paths: Iterable[str], prefix: str = "asset"):
+        """Queue downloads in order; paths already queued are skipped"""
+        for s3_path in s3_paths:
+            if not s3_path or not s3_path.startswith("s3://") or s3_path in self._futures:
+                continue
+            ext = os.path.splitext(s3_path)[1]
+            local_path = os.path.join(self.temp_dir, f"{prefix}_{uuid.uuid4()}{ext}")
+            self.local_paths[s3_path] = local_path
+            self._futures[s3_path] = self._pool.submit(self._download, s3_path, local_path)
+
+    def map(self, fn: Callable[[str], Any], s3_paths: Iterable[str]) -> List[Any]:
+        """Run a per-object S3 call (e.g. head_object) on the download pool; results in order"""
+        return list(self._pool.map(fn, s3_paths))
+
+    def wait(self, s3_paths: Iterable[str]) -> Dict[str, str]:
+        """Block until the given assets are downloaded; returns S3 path -> local path"""
+        ready = {}
+        for s3_path in s3_paths:
+            future = self._futures.get(s3_path)
+            if future is None:
+                continue
+            future.result()  # Re-raises download errors
+            ready[s3_path] = self.local_paths[s3_path]
+        return ready
+
+    def close(self):
+        """Cancel queued downloads, wait for running ones and delete all local copies"""
+        for future in self._futures.values():
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        for local_path in self.local_paths.values():
+            if os.path.exists(local_path):
+                os.remove(local_path)
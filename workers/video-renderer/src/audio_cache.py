@@ -0,0 +1,76 @@
+"""
+Decoded Audio Cache
+Local on-disk cache of decoded, resampled PCM shared by all renders on a node
+Keyed by asset content hash + sample rate + channel layout, evicted LRU by total bytes
+"""
+
+import hashlib
+import os
+import uuid
+from typing import Optional
+
+PCM_FORMAT = "f32le"
+
+
+class DecodedAudioCache:
+    """LRU cache of raw PCM files, bounded by total size"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash: str, sample_rate: int, channels: int) -> str:
+        """Cache key for one asset decoded at a sample rate and channel count"""
+        return hashlib.sha256(f"{content_hash}|{sample_rate}|{channels}|{PCM_FORMAT}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.{PCM_FORMAT}")
+
+    def temp_path(self, key: str) -> str:
+        """Path to decode into before put() (same filesystem, so put() is an atomic rename)"""
+        return os.path.join(self.root, f"{key}.{uuid.uuid4()}.tmp")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached PCM path and mark it recently used, or None on a miss"""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, decoded_path: str) -> str:
+        """Move a decoded file into the cache, evict old entries, and return its cached path"""
+        path = self._path(key)
+        os.replace(decoded_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(f".{PCM_FORMAT}"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # Renders still reading an evicted file keep their open mapping
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -5,133 +5,211 @@ Handles voice audio, music, volume ducking, etc.
 """
 
 import ffmpeg
-from typing import List, Dict, Any
+from typing import List, Dict, Optional
 import tempfile
 import os
 import uuid
 
+from audio_cache import DecodedAudioCache
+from audio_mixer import AudioMixer
+from timeline_model import TimelineClip, to_ticks
+
+# Defaults for track "ducking" settings (music lowered under voice)
+DUCKING_AMOUNT_DB = -12.0
+DUCKING_ATTACK = 0.2  # seconds
+DUCKING_RELEASE = 0.5  # seconds
+
 
 class AudioComposer:
     """Composes audio from timeline audio tracks"""
     
-    def __init__(self, audio_clips: List[Dict], output_path: str, sample_rate: int = 44100):
+    def __init__(
+        self,
+        audio_clips: List[Dict],
+        output_path: str,
+        sample_rate: int = 44100,
+        asset_hashes: Optional[Dict[str, str]] = None,  # Audio path -> content hash (ETag)
+        audio_cache: Optional[DecodedAudioCache] = None,
+        voice_outputs: Optional[Dict[str, str]] = None,  # voiceJobId -> S3 path of the cloned audio
+        local_paths: Optional[Dict[str, str]] = None,  # S3 path -> downloaded local path
+    ):
         self.audio_clips = audio_clips
         self.output_path = output_path
         self.sample_rate = sample_rate
+        self.asset_hashes = asset_hashes or {}
+        self.audio_cache = audio_cache
+        self.voice_outputs = voice_outputs or {}
+        self.local_paths = local_paths or {}
     
     def compose(self) -> str:
         """
         Compose audio from clips
         Returns path to composed audio file
         """
-        if not self.audio_clips:
+        # Each distinct asset is decoded once and mixed in NumPy blocks,
+        # so clip count doesn't drive ffmpeg inputs or memory use
+        mixer = AudioMixer(
+            sample_rate=self.sample_rate,
+            channels=2,  # Stereo
+            cache=self.audio_cache,
+        )
+        tracks = {}
+        for clip_data in self.audio_clips:
+            clip = clip_data["clip"]
+            track = clip_data["track"]
+            if track.muted:
+                continue
+            
+            # Get audio file path (from clip metadata or job output)
+            audio_path = self._get_audio_path(clip)
+            if not audio_path:
+                continue
+            
+            # Paths without a real content hash are never cached
+            asset = self.asset_path(clip, self.voice_outputs)
+            asset_hash = self.asset_hashes.get(asset)
+            if asset_hash and asset_hash != asset:
+                mixer.content_hashes[audio_path] = asset_hash
+            
+            mixer.add(
+                audio_path,
+                clip.start_ms,
+                clip.duration_ms,
+                source_start_ms=clip.source_start_ms,
+                gain=track.volume,
+                fade_in_ms=clip.fade_in_ms,
+                fade_out_ms=clip.fade_out_ms,
+                bus=track.id,
+            )
+            tracks[track.id] = track
+        
+        # Sidechain ducking: lower tracks with "ducking" set while voice plays
+        voice_buses = [track_id for track_id, track in tracks.items() if track.is_voice]
+        for track_id, track in tracks.items():
+            if track.ducking is None or track.is_voice or not voice_buses:
+                continue
+            mixer.duck(
+                track_id,
+                voice_buses,
+                float(track.ducking.get("amount", DUCKING_AMOUNT_DB)),
+                attack_ms=to_ticks(track.ducking.get("attack", DUCKING_ATTACK)),
+                release_ms=to_ticks(track.ducking.get("release", DUCKING_RELEASE)),
+            )
+        
+        if not mixer.placements:
             # Generate silence (1 second default, will be trimmed by video duration)
             return self._generate_silence(duration=1.0)
         
+        return mixer.mix(self.output_path, acodec="aac")
+    
+    def build_stream(self, duration: Optional[float] = None) -> Optional[ffmpeg.Stream]:
+        """
+        Build the audio mixing filter graph as an ffmpeg-python stream
+        Passed to FFmpegBuilder so mixing happens inside the video encode
+        (one ffmpeg input per distinct asset; compose() scales better to many
+        clips). Ducking is not applied here, so check has_ducking first.
+        With duration set, an empty timeline gives a silent stream instead of None.
+        """
         # Sort clips by start time
         sorted_clips = sorted(
             self.audio_clips,
-            key=lambda x: x["clip"].startTime
+            key=lambda x: x["clip"].start_ms
         )
         
-        # Build FFmpeg filter graph for audio mixing
-        audio_inputs = []
-        filter_parts = []
-        
-        for idx, clip_data in enumerate(sorted_clips):
+        placements = []
+        for clip_data in sorted_clips:
             clip = clip_data["clip"]
             track = clip_data["track"]
-            local_time = clip_data["local_time"]
+            if track.muted:
+                continue
             
             # Get audio file path (from clip metadata or job output)
             audio_path = self._get_audio_path(clip)
             if not audio_path:
                 continue
-            
-            # Add input
-            audio_inputs.append(ffmpeg.input(audio_path))
-            
-            # Calculate timing
-            clip_start = clip.get("startTime", 0) if isinstance(clip, dict) else (getattr(clip, "startTime", 0) if hasattr(clip, "startTime") else 0)
-            clip_duration = clip.get("duration", 0) if isinstance(clip, dict) else (getattr(clip, "duration", 0) if hasattr(clip, "duration") else 0)
-            
-            start_offset = clip_start
-            duration = clip_duration
-            
-            # Volume adjustment
-            volume = track.get("volume", 1.0) if isinstance(track, dict) else (getattr(track, "volume", 1.0) if hasattr(track, "volume") else 1.0)
-            volume_db = 20 * (volume - 1.0) if volume < 1.0 else 0
-            
-            # Build filter
-            filter_parts.append(
-                f"[{idx}:a]"
-                f"adelay={int(start_offset * 1000)}|{int(start_offset * 1000)}"
-                f",volume={volume_db}dB"
-                f"[a{idx}]"
-            )
+            placements.append((clip, track, audio_path))
+        
+        # One input per distinct asset, split across its clips (ffmpeg-python also
+        # merges identical per-clip input chains, which then can't fan out)
+        uses: Dict[str, int] = {}
+        for _, _, audio_path in placements:
+            uses[audio_path] = uses.get(audio_path, 0) + 1
+        branches: Dict[str, List[ffmpeg.Stream]] = {}
+        for audio_path, count in uses.items():
+            source = ffmpeg.input(audio_path).audio
+            if count == 1:
+                branches[audio_path] = [source]
+            else:
+                split = source.filter_multi_output("asplit", count)
+                branches[audio_path] = [split.stream(i) for i in range(count)]
         
-        # Mix all audio streams
-        if len(filter_parts) > 1:
-            mix_inputs = "".join([f"[a{i}]" for i in range(len(filter_parts))])
-            filter_complex = ";".join(filter_parts) + f";{mix_inputs}amix=inputs={len(filter_parts)}:duration=longest[aout]"
-        else:
-            filter_complex = filter_parts[0] if filter_parts else ""
-            filter_complex = filter_complex.replace("[a0]", "[aout]")
+        # Build FFmpeg filter graph for audio mixing
+        mixed_streams = []
         
-        # Build FFmpeg command
-        if filter_complex:
-            stream = ffmpeg.output(
-                *audio_inputs,
-                self.output_path,
-                v="error",
-                acodec="aac",
-                ar=self.sample_rate,
-                ac=2,  # Stereo
-                filter_complex=filter_complex,
-                map="[aout]",
+        for clip, track, audio_path in placements:
+            # Timing is already in millisecond ticks
+            start_offset_ms = clip.start_ms
+            
+            stream = (
+                branches[audio_path].pop(0)
+                .filter("atrim", start=clip.source_start, duration=clip.duration)
+                .filter("asetpts", "PTS-STARTPTS")
             )
-        else:
-            # Single audio input, no mixing needed
-            stream = audio_inputs[0].output(
-                self.output_path,
-                v="error",
-                acodec="aac",
-                ar=self.sample_rate,
-                ac=2,
+            if clip.fade_in_ms:
+                stream = stream.filter("afade", t="in", st=0, d=clip.fade_in_ms / 1000)
+            if clip.fade_out_ms:
+                fade_out = min(clip.fade_out_ms, clip.duration_ms) / 1000
+                stream = stream.filter("afade", t="out", st=clip.duration - fade_out, d=fade_out)
+            mixed_streams.append(
+                stream
+                .filter("adelay", f"{start_offset_ms}|{start_offset_ms}")
+                .filter("volume", track.volume)
             )
         
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        if not mixed_streams:
+            if duration is None:
+                return None
+            return ffmpeg.input(
+                f"anullsrc=r={self.sample_rate}:cl=stereo", f="lavfi", t=duration
+            ).audio
         
-        return self.output_path
+        # Mix all audio streams: summed like compose(), not scaled by 1/inputs,
+        # so loudness matches whichever path renders the timeline
+        if len(mixed_streams) == 1:
+            return mixed_streams[0]
+        return ffmpeg.filter(
+            mixed_streams,
+            "amix",
+            inputs=len(mixed_streams),
+            duration="longest",
+            normalize=0,
+            dropout_transition=0,
+        )
     
-    def _get_audio_path(self, clip: Any) -> str:
-        """Get audio file path from clip"""
-        # Handle dict or object
-        if isinstance(clip, dict):
-            # Check if clip has voice audio
-            if clip.get("voiceJobId"):
-                # Resolve from job output
-                # TODO: Fetch from job output
-                pass
-            
-            # Check clip audio track
-            if clip.get("audioTrack"):
-                return clip["audioTrack"].get("filePath", "")
-        else:
-            # Check if clip has voice audio
-            if hasattr(clip, "voiceJobId") and clip.voiceJobId:
-                # Resolve from job output
-                # TODO: Fetch from job output
-                pass
-            
-            # Check clip audio track
-            if hasattr(clip, "audioTrack") and clip.audioTrack:
-                if isinstance(clip.audioTrack, dict):
-                    return clip.audioTrack.get("filePath", "")
-                elif hasattr(clip.audioTrack, "filePath"):
-                    return clip.audioTrack.filePath
-        
-        return None
+    @property
+    def has_ducking(self) -> bool:
+        """True if any track ducks under voice (only compose() applies ducking)"""
+        return self.clips_duck(self.audio_clips)
+    
+    @staticmethod
+    def clips_duck(audio_clips: List[Dict]) -> bool:
+        """has_ducking for a list of audio clips, before a composer exists"""
+        tracks = {clip_data["track"].id: clip_data["track"] for clip_data in audio_clips}
+        return any(track.is_voice for track in tracks.values()) and any(
+            track.ducking is not None and not track.is_voice for track in tracks.values()
+        )
+    
+    @staticmethod
+    def asset_path(clip: TimelineClip, voice_outputs: Dict[str, str]) -> Optional[str]:
+        """S3 path of a clip's audio: voice job output first, then the clip audio track"""
+        if clip.voice_job_id and clip.voice_job_id in voice_outputs:
+            return voice_outputs[clip.voice_job_id]
+        return clip.audio_path
+    
+    def _get_audio_path(self, clip: TimelineClip) -> Optional[str]:
+        """Get local audio file path for clip"""
+        asset = self.asset_path(clip, self.voice_outputs)
+        return self.local_paths.get(asset, asset)
     
     def _generate_silence(self, duration: float = 1.0) -> str:
         """Generate silence audio"""
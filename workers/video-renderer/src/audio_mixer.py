@@ -0,0 +1,327 @@
+"""
+Audio Mixer
+Sample-accurate NumPy mixing engine for timelines with many audio clips
+ffmpeg is only used to decode assets to float32 PCM and to encode the mix
+"""
+
+import os
+import tempfile
+import uuid
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Optional, Iterable, Tuple
+
+import ffmpeg
+import numpy as np
+
+from audio_cache import DecodedAudioCache
+
+# Decoded assets larger than this stay on disk and are memory-mapped
+MMAP_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+
+class AudioPlacement:
+    """One asset placed on the output timeline, in samples"""
+    __slots__ = ("path", "start", "end", "offset", "gain", "fade_in", "fade_out", "bus")
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        offset: int,
+        gain: float,
+        fade_in: int = 0,
+        fade_out: int = 0,
+        bus: str = "",
+    ):
+        self.path = path
+        self.start = start  # First output sample
+        self.end = end  # Output sample after the last one
+        self.offset = offset  # Asset sample played at start
+        self.gain = gain  # Linear gain
+        self.fade_in = fade_in  # Linear fade-in length in samples
+        self.fade_out = fade_out  # Linear fade-out length in samples
+        self.bus = bus  # Group used for ducking (e.g. the track id)
+
+
+class Ducking:
+    """Sidechain ducking of one bus while any key bus is playing"""
+    __slots__ = ("key_buses", "gain", "attack", "release", "starts", "ends")
+
+    def __init__(self, key_buses: Iterable[str], gain: float, attack: int, release: int):
+        self.key_buses = set(key_buses)
+        self.gain = gain  # Linear gain while fully ducked
+        self.attack = attack  # Samples to ramp down before key audio starts
+        self.release = release  # Samples to ramp back up after it ends
+        self.starts: List[int] = []  # Merged key intervals, filled by the mixer
+        self.ends: List[int] = []
+
+    def envelope(self, block_start: int, block_end: int) -> Optional[np.ndarray]:
+        """Gain envelope for [block_start, block_end), or None if not ducked there"""
+        # Merged intervals are disjoint, so starts and ends are both sorted
+        first = bisect_right(self.ends, block_start - self.release)
+        last = bisect_left(self.starts, block_end + self.attack)
+        if first >= last:
+            return None
+        # float64: sample indices exceed float32's exact integer range after ~6 minutes
+        t = np.arange(block_start, block_end, dtype=np.float64)
+        depth = np.zeros(len(t))
+        for start, end in zip(self.starts[first:last], self.ends[first:last]):
+            # Trapezoid: ramps to 1 over attack before start, back to 0 over release after end
+            rise = (t - (start - self.attack - 1)) / (self.attack + 1)
+            fall = (end + self.release - t) / (self.release + 1)
+            np.maximum(depth, np.clip(np.minimum(rise, fall), 0.0, 1.0), out=depth)
+        return (1.0 - depth * (1.0 - self.gain)).astype(np.float32)
+
+
+class AudioMixer:
+    """
+    Mixes placed audio assets into one stream, block by block
+    Each distinct asset is decoded once (and released after its last
+    placement), and only one output block is held in memory, so memory stays
+    bounded regardless of clip count. Clips are summed without amix-style
+    normalization, so loudness does not depend on how many clips overlap.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        channels: int = 2,
+        block_size: int = 65536,  # Samples per output block
+        temp_dir: Optional[str] = None,
+        cache: Optional[DecodedAudioCache] = None,  # Decoded PCM shared across renders
+        content_hashes: Optional[Dict[str, str]] = None,  # Asset path -> content hash (cache key)
+    ):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_size = block_size
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+        self.cache = cache
+        self.content_hashes = content_hashes or {}
+        self.placements: List[AudioPlacement] = []
+        self.ducking: Dict[str, Ducking] = {}
+        self._assets: Dict[str, np.ndarray] = {}
+        self._raw_paths: Dict[str, str] = {}
+
+    def to_samples(self, ms: int) -> int:
+        """Convert millisecond ticks to a sample index"""
+        return ms * self.sample_rate // 1000
+
+    def add(
+        self,
+        path: str,
+        start_ms: int,
+        duration_ms: int,
+        source_start_ms: int = 0,
+        gain: float = 1.0,
+        fade_in_ms: int = 0,
+        fade_out_ms: int = 0,
+        bus: str = "",
+    ):
+        """Place an asset at start_ms for duration_ms, starting source_start_ms into it"""
+        start = self.to_samples(start_ms)
+        end = start + self.to_samples(duration_ms)
+        if end > start:
+            self.placements.append(AudioPlacement(
+                path,
+                start,
+                end,
+                self.to_samples(source_start_ms),
+                gain,
+                fade_in=min(self.to_samples(fade_in_ms), end - start),
+                fade_out=min(self.to_samples(fade_out_ms), end - start),
+                bus=bus,
+            ))
+
+    def duck(self, bus: str, key_buses: Iterable[str], amount_db: float, attack_ms: int, release_ms: int):
+        """Lower bus by amount_db (negative) whenever a key bus is playing"""
+        self.ducking[bus] = Ducking(
+            key_buses, 10 ** (amount_db / 20), self.to_samples(attack_ms), self.to_samples(release_ms)
+        )
+
+    @property
+    def length(self) -> int:
+        """Length of the mix in samples"""
+        return max((p.end for p in self.placements), default=0)
+
+    def mix(self, output_path: str, length: Optional[int] = None, **output_args) -> str:
+        """
+        Mix all placements and encode to output_path
+        output_args are passed to the ffmpeg output (e.g. acodec="aac").
+        """
+        length = self.length if length is None else length
+        encoder = (
+            ffmpeg
+            .input("pipe:", format="f32le", ar=self.sample_rate, ac=self.channels)
+            .output(output_path, v="error", ar=self.sample_rate, ac=self.channels, **output_args)
+            .overwrite_output()
+            .run_async(pipe_stdin=True)
+        )
+        try:
+            for block in self.iter_blocks(length):
+                encoder.stdin.write(block.tobytes())
+        finally:
+            encoder.stdin.close()
+            encoder.wait()
+            self._release_all()
+        if encoder.returncode != 0:
+            raise RuntimeError(f"Audio encode failed with exit code {encoder.returncode}")
+        return output_path
+
+    def iter_blocks(self, length: int):
+        """Yield mixed float32 blocks of shape (samples, channels) covering [0, length)"""
+        placements = sorted(self.placements, key=lambda p: p.start)
+        remaining: Dict[str, int] = {}
+        for placement in placements:
+            remaining[placement.path] = remaining.get(placement.path, 0) + 1
+
+        for ducking in self.ducking.values():
+            ducking.starts, ducking.ends = self._merge_intervals(
+                (p.start, p.end) for p in placements if p.bus in ducking.key_buses
+            )
+
+        active: List[AudioPlacement] = []
+        next_idx = 0
+        for block_start in range(0, length, self.block_size):
+            block_end = min(block_start + self.block_size, length)
+            block = np.zeros((block_end - block_start, self.channels), dtype=np.float32)
+            envelopes = {
+                bus: ducking.envelope(block_start, block_end) for bus, ducking in self.ducking.items()
+            }
+
+            while next_idx < len(placements) and placements[next_idx].start < block_end:
+                active.append(placements[next_idx])
+                next_idx += 1
+
+            still_active = []
+            for placement in active:
+                self._add_placement(block, block_start, block_end, placement, envelopes.get(placement.bus))
+                if placement.end > block_end:
+                    still_active.append(placement)
+                else:
+                    remaining[placement.path] -= 1
+                    if not remaining[placement.path]:
+                        self._release(placement.path)
+            active = still_active
+
+            np.clip(block, -1.0, 1.0, out=block)
+            yield block
+
+    @staticmethod
+    def _merge_intervals(intervals: Iterable[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        """Merge overlapping intervals into sorted start and end lists"""
+        starts: List[int] = []
+        ends: List[int] = []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def _add_placement(
+        self,
+        block: np.ndarray,
+        block_start: int,
+        block_end: int,
+        placement: AudioPlacement,
+        bus_envelope: Optional[np.ndarray] = None,
+    ):
+        """Accumulate the part of a placement that falls inside the block"""
+        start = max(placement.start, block_start)
+        end = min(placement.end, block_end)
+        if end <= start:
+            return
+        data = self._load(placement.path)
+        src_start = placement.offset + (start - placement.start)
+        src_end = min(src_start + (end - start), len(data))
+        if src_end <= src_start:
+            return
+        out_start = start - block_start
+        chunk = data[src_start:src_end]
+        out_end = out_start + len(chunk)
+
+        envelope = self._fade_envelope(placement, block_start + out_start, block_start + out_end)
+        if bus_envelope is not None:
+            ducked = bus_envelope[out_start:out_end]
+            envelope = ducked if envelope is None else envelope * ducked
+        if envelope is not None:
+            chunk = chunk * (envelope * np.float32(placement.gain))[:, None]
+        elif placement.gain != 1.0:
+            chunk = chunk * np.float32(placement.gain)
+        block[out_start:out_end] += chunk
+
+    @staticmethod
+    def _fade_envelope(placement: AudioPlacement, start: int, end: int) -> Optional[np.ndarray]:
+        """Fade in/out gain for output samples [start, end), or None outside the fades"""
+        in_fade = placement.fade_in and start < placement.start + placement.fade_in
+        out_fade = placement.fade_out and end > placement.end - placement.fade_out
+        if not (in_fade or out_fade):
+            return None
+        t = np.arange(start, end, dtype=np.float64)
+        envelope = np.ones(len(t))
+        if in_fade:
+            np.minimum(envelope, (t - placement.start) / placement.fade_in, out=envelope)
+        if out_fade:
+            np.minimum(envelope, (placement.end - 1 - t) / placement.fade_out, out=envelope)
+        return envelope.astype(np.float32)
+
+    def _load(self, path: str) -> np.ndarray:
+        """Decode an asset once to float32 PCM at the mix rate and layout"""
+        if path in self._assets:
+            return self._assets[path]
+
+        content_hash = self.content_hashes.get(path)
+        cache_key = None
+        if self.cache and content_hash:
+            cache_key = self.cache.make_key(content_hash, self.sample_rate, self.channels)
+            cached_path = self.cache.get(cache_key)
+            if cached_path:
+                try:
+                    data = self._read_pcm(cached_path)
+                    self._assets[path] = data
+                    return data
+                except FileNotFoundError:
+                    pass  # Evicted by another render in between; decode again
+
+        if cache_key:
+            raw_path = self.cache.temp_path(cache_key)
+        else:
+            raw_path = os.path.join(self.temp_dir, f"pcm_{uuid.uuid4()}.f32")
+        (
+            ffmpeg
+            .input(path)
+            .output(raw_path, format="f32le", acodec="pcm_f32le", ar=self.sample_rate, ac=self.channels)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+        if cache_key:
+            data = self._read_pcm(self.cache.put(cache_key, raw_path))
+        else:
+            data = self._read_pcm(raw_path)
+            if isinstance(data, np.memmap):
+                self._raw_paths[path] = raw_path
+            else:
+                os.remove(raw_path)
+
+        self._assets[path] = data
+        return data
+
+    def _read_pcm(self, pcm_path: str) -> np.ndarray:
+        """Load raw PCM, memory-mapping large files"""
+        if os.path.getsize(pcm_path) >= MMAP_THRESHOLD_BYTES:
+            return np.memmap(pcm_path, dtype=np.float32, mode="r").reshape(-1, self.channels)
+        return np.fromfile(pcm_path, dtype=np.float32).reshape(-1, self.channels)
+
+    def _release(self, path: str):
+        """Drop a decoded asset once no later placement uses it"""
+        self._assets.pop(path, None)
+        raw_path = self._raw_paths.pop(path, None)
+        if raw_path and os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    def _release_all(self):
+        for path in list(self._assets):
+            self._release(path)
@@ -5,14 +5,28 @@ Handles video clips, audio mixing, subtitle burn-in, face transformation hooks
 """
 
 import ffmpeg
-from typing import List, Dict, Any, Optional
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Tuple
 import tempfile
 import os
 
+from render_profiles import DEFAULT_PROFILE, get_profile, part_format
+
+AUDIO_SAMPLE_RATE = 44100
+
 
 class FFmpegBuilder:
     """Builds FFmpeg command for final video composition"""
-    
+
+    # Output keyframe interval; chunked renders split on multiples of it
+    GOP_SECONDS = 2.0
+
+    # Uses of one source further apart than this (in source time) get their own
+    # seeked input; nearer ones share a decode through split. Decoding the gap,
+    # and buffering frames for branches consumed out of source order, costs more
+    # than opening the file again.
+    SPLIT_MAX_GAP_SECONDS = 10.0
+
     def __init__(
         self,
         video_clips: List[str],  # Paths to video files
@@ -22,35 +36,316 @@ class FFmpegBuilder:
         resolution: tuple = (1920, 1080),
         fps: float = 30.0,
         format: str = "16:9",
+        threads: int = 0,  # Encoder threads (0 = ffmpeg default)
+        profile: str = DEFAULT_PROFILE,  # Render profile name (see render_profiles)
+        audio_stream: Optional[ffmpeg.Stream] = None,  # Audio mix graph instead of audio_path
+        fragmented: bool = False,  # Fragmented MP4 that can be written to a pipe and uploaded while encoding
     ):
         self.video_clips = video_clips
         self.audio_path = audio_path
+        self.audio_stream = audio_stream
+        self.fragmented = fragmented
         self.subtitle_path = subtitle_path
         self.output_path = output_path
         self.resolution = resolution
         self.fps = fps
         self.format = format
-    
+        self.threads = threads
+        self.profile = get_profile(profile)
+        self.part_format, self.part_extension = part_format(profile)
+        self._probes: Dict[str, Dict[str, Any]] = {}
+
     def build(self) -> ffmpeg.Stream:
         """
         Build FFmpeg filter graph for final composition
         Returns FFmpeg stream ready to run
         """
-        # For now, handle single video + audio + subtitles
-        # Multi-clip composition will be handled by timeline resolver
-        
+        # Single video + audio + subtitles; see build_multi_clip for timelines
+
         if not self.video_clips:
             raise ValueError("No video clips provided")
-        
+
         # Input video
         video_input = ffmpeg.input(self.video_clips[0])
-        
-        # Input audio
-        audio_input = ffmpeg.input(self.audio_path)
-        
-        # Build video filter chain
-        video_stream = video_input.video
-        
+
+        # Scale/pad to target resolution and set FPS
+        video_stream = self._normalize(video_input.video)
+
+        return self._output(video_stream, self._audio_input())
+
+    def build_multi_clip(
+        self,
+        segments: List[Any],
+        source_paths: Dict[str, str],
+        time_offset: float = 0.0,
+    ) -> ffmpeg.Stream:
+        """
+        Build a single-pass filter graph for a whole timeline
+        Each source file is decoded and normalized once per group of nearby uses
+        (see SPLIT_MAX_GAP_SECONDS), then split into one trimmed branch per
+        segment that uses it. Stacked clips in a segment are
+        overlaid in track order, gaps are filled with black, and the segments
+        are concatenated. A range that is all gap (e.g. a chunk past the last
+        clip) renders as black.
+
+        segments: EditSegments from TimelineResolver.resolve_segments()
+        source_paths: clip file path (as stored in the timeline) -> local path
+        time_offset: timeline time of the first segment (for chunked renders)
+
+        Without audio_path or audio_stream, a video-only part for build_concat
+        is built (in the profile's part_format).
+        """
+        # Source range each segment layer reads, grouped per source file
+        uses: Dict[str, List[Tuple[float, float, int]]] = {}
+        for segment in segments:
+            for clip_data in segment.video_clips:
+                clip = clip_data["clip"]
+                if clip.file_path in source_paths:
+                    source_start = max(clip.source_start + (segment.start - clip.start), 0.0)
+                    uses.setdefault(clip.file_path, []).append(
+                        (source_start, source_start + segment.duration, self._use_key(clip, segment))
+                    )
+
+        # One input, decode and scale/pad/fps chain per group of nearby uses,
+        # seeked to the group's first frame and split into one branch per use
+        branches: Dict[Tuple[int, int], Tuple[ffmpeg.Stream, float]] = {}
+        for file_path, ranges in uses.items():
+            for group in self._group_uses(ranges):
+                seek = group[0][0]
+                input_args = {"ss": seek} if seek > 0 else {}
+                stream = self._normalize(ffmpeg.input(source_paths[file_path], **input_args).video)
+                if len(group) > 1:
+                    split = stream.split()
+                    group_streams = [split[i] for i in range(len(group))]
+                else:
+                    group_streams = [stream]
+                for (_, _, key), branch in zip(group, group_streams):
+                    branches[key] = (branch, seek)
+
+        def take_branch(clip: Any, segment: Any) -> ffmpeg.Stream:
+            branch, seek = branches[self._use_key(clip, segment)]
+            return self._trim_clip(branch, clip, segment, seek)
+
+        segment_streams = []
+        for segment in segments:
+            if segment.duration <= 0:
+                continue
+            segment_streams.append(self._compose_segment(segment, source_paths, take_branch))
+        if not segment_streams:
+            raise ValueError("No timeline segments to render")
+
+        if len(segment_streams) > 1:
+            video_stream = ffmpeg.concat(*segment_streams, v=1, a=0)
+        else:
+            video_stream = segment_streams[0]
+
+        if not self.audio_path and self.audio_stream is None:
+            return self._output_part(video_stream, self.output_path, time_offset)
+        return self._output(video_stream, self._audio_input())
+
+    @staticmethod
+    def _use_key(clip: Any, segment: Any) -> Tuple[int, int]:
+        """Identifies one clip layer of one segment"""
+        return id(segment), id(clip)
+
+    def _group_uses(self, ranges: List[Tuple[float, float, Any]]) -> List[List[Tuple[float, float, Any]]]:
+        """Group (start, end, key) source ranges, ordered by start, that lie within SPLIT_MAX_GAP_SECONDS"""
+        groups: List[List[Tuple[float, float, Any]]] = []
+        reach = 0.0
+        for use in sorted(ranges, key=lambda use: use[0]):
+            if groups and use[0] <= reach + self.SPLIT_MAX_GAP_SECONDS:
+                groups[-1].append(use)
+                reach = max(reach, use[1])
+            else:
+                groups.append([use])
+                reach = use[1]
+        return groups
+
+    def _compose_segment(self, segment: Any, source_paths: Dict[str, str], take_layer) -> ffmpeg.Stream:
+        """Overlay a segment's clips in track order (black if nothing is playing)"""
+        composed = None
+        for clip_data in segment.video_clips:
+            clip = clip_data["clip"]
+            if clip.file_path not in source_paths:
+                continue
+            layer = take_layer(clip, segment)
+            if composed is None:
+                composed = layer
+            else:
+                composed = self._overlay(composed, layer, clip)
+
+        if composed is None:
+            composed = self._black(segment.duration)
+        return composed
+
+    def probe_source(self, path: str) -> Dict[str, Any]:
+        """Probe a source's video stream parameters (cached per path; no packet scan)"""
+        if path in self._probes:
+            return self._probes[path]
+
+        probe = ffmpeg.probe(path, select_streams="v:0")
+        stream = probe["streams"][0] if probe.get("streams") else {}
+        num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+
+        info = {
+            "codec": stream.get("codec_name"),
+            "profile": stream.get("profile"),
+            "level": stream.get("level"),
+            "pix_fmt": stream.get("pix_fmt"),
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "fps": float(num) / float(den or 1) if num else 0.0,
+        }
+        self._probes[path] = info
+        return info
+
+    def keyframes_between(self, path: str, start: float, end: float) -> List[float]:
+        """
+        Keyframe times of a source around [start, end]
+        Only the packets of the range are read, so neither local nor URL
+        sources are scanned in full.
+        """
+        return self._probe_keyframes(path, read_intervals=f"{max(start, 0.0)}%{end}")
+
+    @staticmethod
+    def _probe_keyframes(path: str, **probe_args) -> List[float]:
+        """Scan video packets for keyframe times"""
+        packets = ffmpeg.probe(
+            path,
+            select_streams="v:0",
+            show_entries="packet=pts_time,flags",
+            **probe_args,
+        ).get("packets", [])
+        return sorted(
+            float(packet["pts_time"])
+            for packet in packets
+            if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A")
+        )
+
+    def _can_stream_copy(self, segment: Any, source_paths: Dict[str, str]) -> bool:
+        """True if a segment is a plain cut of a source already in the output format"""
+        if self.profile["encoder"]["vcodec"] != "libx264":
+            return False
+        if len(segment.video_clips) != 1 or segment.subtitles or segment.transformations:
+            return False
+        clip = segment.video_clips[0]["clip"]
+        if clip.file_path not in source_paths:
+            return False
+        if clip.scale != 1.0 or clip.opacity < 1.0 or clip.position:
+            return False
+
+        info = self.probe_source(source_paths[clip.file_path])
+        return (
+            info["codec"] == "h264"
+            and info["pix_fmt"] == "yuv420p"
+            and (info["width"], info["height"]) == tuple(self.resolution)
+            and abs(info["fps"] - self.fps) < 0.01
+        )
+
+    def plan_parts(self, segments: List[Any], source_paths: Dict[str, str]) -> List["RenderPart"]:
+        """
+        Split the timeline into parts for the stream-copy fast path
+        Plain cuts are stream-copied between the first and last keyframe in
+        range; only the partial GOPs at either end are re-encoded. Segments
+        that need filtering (overlays, scaling, subtitles, gaps) are composed.
+        """
+        parts = []
+        for segment in segments:
+            if segment.duration <= 0:
+                continue
+            if not self._can_stream_copy(segment, source_paths):
+                parts.append(RenderPart("compose", segment))
+                continue
+
+            clip = segment.video_clips[0]["clip"]
+            path = source_paths[clip.file_path]
+            start = clip.source_start + (segment.start - clip.start)
+            end = start + segment.duration
+            keyframes = self.keyframes_between(path, start, end)
+            first_idx = bisect_left(keyframes, start)
+            last_idx = bisect_right(keyframes, end) - 1
+            if first_idx > last_idx or keyframes[first_idx] >= keyframes[last_idx]:
+                parts.append(RenderPart("cut", segment, path, start, end))
+                continue
+
+            copy_start, copy_end = keyframes[first_idx], keyframes[last_idx]
+            if copy_start > start:
+                parts.append(RenderPart("cut", segment, path, start, copy_start))
+            parts.append(RenderPart("copy", segment, path, copy_start, copy_end))
+            if end > copy_end:
+                parts.append(RenderPart("cut", segment, path, copy_end, end))
+        return parts
+
+    def build_part(self, part: "RenderPart", source_paths: Dict[str, str], part_path: str) -> ffmpeg.Stream:
+        """Build the command for one video-only part (in the profile's part_format)"""
+        if part.mode == "copy":
+            return ffmpeg.input(
+                part.source_path, ss=part.source_start, t=part.source_end - part.source_start
+            ).video.output(part_path, vcodec="copy", f=self.part_format, avoid_negative_ts="make_zero")
+
+        if part.mode == "cut":
+            # Match the source's profile/level so copied and encoded GOPs concat cleanly
+            info = self.probe_source(part.source_path)
+            video_stream = ffmpeg.input(
+                part.source_path, ss=part.source_start, t=part.source_end - part.source_start
+            ).video
+            encode_args = self._encode_args()
+            profile = (info.get("profile") or "").lower()
+            if profile:
+                encode_args["profile:v"] = "baseline" if "baseline" in profile else profile.replace(" ", "")
+            if info.get("level"):
+                encode_args["level"] = f"{info['level'] / 10:.1f}"
+            return video_stream.output(part_path, f=self.part_format, **encode_args)
+
+        def open_layer(clip: Any, segment: Any) -> ffmpeg.Stream:
+            source_start = max(clip.source_start + (segment.start - clip.start), 0.0)
+            layer = ffmpeg.input(
+                source_paths[clip.file_path], ss=source_start, t=segment.duration
+            ).video
+            return self._normalize(layer).setpts("PTS-STARTPTS")
+
+        video_stream = self._compose_segment(part.segment, source_paths, open_layer)
+        return self._output_part(video_stream, part_path, part.segment.start)
+
+    def build_concat(self, part_paths: List[str], list_path: str) -> ffmpeg.Stream:
+        """Join parts with the concat demuxer (no re-encode) and mux composed audio"""
+        with open(list_path, "w") as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        video_input = ffmpeg.input(list_path, f="concat", safe=0)
+        return ffmpeg.output(
+            video_input.video,
+            self._audio_input(),
+            self.output_path,
+            vcodec="copy",
+            acodec="aac",
+            audio_bitrate=self.profile["audio_bitrate"],
+            ar=AUDIO_SAMPLE_RATE,
+            ac=2,  # Stereo
+            **self._container_args(),
+            **self._output_tags(),
+        )
+
+    def _output_tags(self) -> Dict[str, Any]:
+        """Stream tags the profile sets on its encode (e.g. hvc1 for Apple players), kept on stream copy"""
+        return {key: value for key, value in self.profile["encoder"].items() if key.startswith("tag:")}
+
+    def _container_args(self) -> Dict[str, str]:
+        """MP4 muxer options for the final output"""
+        if self.fragmented:
+            # Written strictly sequentially (no moov rewrite), so output can be streamed
+            return {"f": "mp4", "movflags": "frag_keyframe+empty_moov+default_base_moof"}
+        return {"movflags": "faststart"}  # Web-optimized
+
+    def _audio_input(self) -> ffmpeg.Stream:
+        """Audio for the final mux: inline mix graph, or the composed audio file"""
+        if self.audio_stream is not None:
+            return self.audio_stream
+        return ffmpeg.input(self.audio_path).audio
+
+    def _normalize(self, video_stream: ffmpeg.Stream) -> ffmpeg.Stream:
+        """Scale/pad to target resolution and set FPS"""
         # Scale to target resolution
         video_stream = video_stream.filter(
             "scale",
@@ -58,7 +353,7 @@ class FFmpegBuilder:
             self.resolution[1],
             force_original_aspect_ratio="decrease",
         )
-        
+
         # Pad to exact resolution (letterbox/pillarbox)
         video_stream = video_stream.filter(
             "pad",
@@ -68,39 +363,105 @@ class FFmpegBuilder:
             "(oh-ih)/2",
             color="black",
         )
-        
-        # Set FPS
+
+        # Set FPS (and square pixels so concat accepts every branch)
         video_stream = video_stream.filter("fps", fps=self.fps)
-        
+        return video_stream.filter("setsar", 1)
+
+    def _trim_clip(self, stream: ffmpeg.Stream, clip: Any, segment: Any, seek: float = 0.0) -> ffmpeg.Stream:
+        """Cut the part of a clip's source that plays during a segment"""
+        # Input seeking restarts timestamps at the seek point
+        source_start = max(clip.source_start + (segment.start - clip.start), 0.0) - seek
+        stream = stream.trim(start=source_start, end=source_start + segment.duration)
+        return stream.setpts("PTS-STARTPTS")
+
+    def _overlay(self, base: ffmpeg.Stream, layer: ffmpeg.Stream, clip: Any) -> ffmpeg.Stream:
+        """Overlay an upper-track clip on the composed segment"""
+        if clip.scale != 1.0:
+            layer = layer.filter("scale", f"iw*{clip.scale}", f"ih*{clip.scale}")
+        if clip.opacity < 1.0:
+            layer = layer.filter("format", "yuva420p").filter(
+                "colorchannelmixer", aa=clip.opacity
+            )
+        x, y = clip.position if clip.position else (0, 0)
+        return ffmpeg.overlay(base, layer, x=x, y=y, eof_action="pass")
+
+    def _black(self, duration: float) -> ffmpeg.Stream:
+        """Black filler for timeline gaps"""
+        return ffmpeg.input(
+            f"color=c=black:s={self.resolution[0]}x{self.resolution[1]}:r={self.fps}:d={duration}",
+            f="lavfi",
+        ).video.filter("setsar", 1)
+
+    def _burn_subtitles(self, video_stream: ffmpeg.Stream, time_offset: float = 0.0) -> ffmpeg.Stream:
+        """Burn the ASS subtitle file into the video"""
+        if time_offset:
+            # Subtitle times are timeline-relative; shift the part onto the timeline clock
+            video_stream = video_stream.setpts(f"PTS-STARTPTS+{time_offset}/TB")
+        video_stream = video_stream.filter(
+            "subtitles",
+            self.subtitle_path,
+            force_style="FontName=Arial,FontSize=24,PrimaryColour=&Hffffff",
+        )
+        if time_offset:
+            video_stream = video_stream.setpts("PTS-STARTPTS")
+        return video_stream
+
+    def _encode_args(self) -> Dict[str, Any]:
+        """Video encoder settings from the render profile"""
+        return {
+            **self.profile["encoder"],
+            "pix_fmt": "yuv420p",
+            "g": max(int(round(self.fps * self.GOP_SECONDS)), 1),
+            **({"threads": self.threads} if self.threads else {}),
+        }
+
+    def _output(self, video_stream: ffmpeg.Stream, audio_stream: ffmpeg.Stream) -> ffmpeg.Stream:
+        """Burn subtitles and build the encoded output"""
         # Burn subtitles if provided
         if self.subtitle_path:
-            video_stream = video_stream.filter(
-                "subtitles",
-                self.subtitle_path,
-                force_style="FontName=Arial,FontSize=24,PrimaryColour=&Hffffff",
-            )
-        
+            video_stream = self._burn_subtitles(video_stream)
+
         # Build output
         output = ffmpeg.output(
             video_stream,
-            audio_input.audio,
+            audio_stream,
             self.output_path,
-            vcodec="libx264",
             acodec="aac",
-            preset="medium",
-            crf=23,  # Quality (18-28, lower = better)
-            pix_fmt="yuv420p",
-            movflags="faststart",  # Web-optimized
+            audio_bitrate=self.profile["audio_bitrate"],
+            ar=AUDIO_SAMPLE_RATE,
+            ac=2,  # Stereo
+            **self._container_args(),
+            **self._encode_args(),
         )
-        
+
         return output
-    
-    def build_multi_clip(self, clip_timeline: List[Dict]) -> ffmpeg.Stream:
-        """
-        Build FFmpeg filter graph for multiple clips with transitions
-        More complex composition for future use
-        """
-        # TODO: Implement multi-clip composition with transitions
-        # This will use concat filter or complex filter graph
-        pass
 
+    def _output_part(self, video_stream: ffmpeg.Stream, part_path: str, time_offset: float) -> ffmpeg.Stream:
+        """Burn subtitles and encode a video-only part (in the profile's part_format)"""
+        if self.subtitle_path:
+            video_stream = self._burn_subtitles(video_stream, time_offset)
+        return video_stream.output(part_path, f=self.part_format, **self._encode_args())
+
+
+class RenderPart:
+    """
+    Piece of the output for the stream-copy fast path
+    mode: "copy" (stream copy of a source range), "cut" (re-encode a source
+    range without filters) or "compose" (full filter graph for the segment)
+    """
+    __slots__ = ("mode", "segment", "source_path", "source_start", "source_end")
+
+    def __init__(
+        self,
+        mode: str,
+        segment: Any,
+        source_path: Optional[str] = None,
+        source_start: float = 0.0,
+        source_end: float = 0.0,
+    ):
+        self.mode = mode
+        self.segment = segment
+        self.source_path = source_path
+        self.source_start = source_start
+        self.source_end = source_end
@@ -4,10 +4,13 @@ Final composition engine - turns timeline + assets → final video
 Implements worker contract: /execute, /status, /health
 """
 
+import asyncio
+import functools
 import os
 import uuid
 import json
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
 from pydantic import BaseModel
 import boto3
@@ -16,11 +19,19 @@ import ffmpeg
 import tempfile
 
 # Import renderer components
+from timeline_model import Timeline
 from timeline_resolver import TimelineResolver
+from common.asset_cache import cache_from_env, download_dir
+from asset_prefetch import AssetPrefetcher
+from audio_cache import DecodedAudioCache
 from audio_composer import AudioComposer
 from subtitle_renderer import SubtitleRenderer
 from face_transformer import FaceTransformer
-from ffmpeg_builder import FFmpegBuilder
+from ffmpeg_builder import FFmpegBuilder, RenderPart
+from common.job_runner import runner_from_env
+from render_profiles import DEFAULT_PROFILE, RENDER_PROFILES, apply_profile, part_format
+from render_cache import RenderCache, SegmentCache, compute_piece_key, compute_render_key
+from common.s3_transfer import MultipartStreamUpload, presign_s3_url, transfer_config_from_env
 
 app = FastAPI(title="Video Renderer Worker")
 
@@ -37,9 +48,47 @@ BUCKET = os.getenv("S3_BUCKET", "video-ai-platform")
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:3001")
 WORKER_API_KEY = os.getenv("WORKER_API_KEY", "")
 
+# Read source videos straight from presigned S3 URLs instead of downloading them first
+S3_STREAM_SOURCES = os.getenv("S3_STREAM_SOURCES", "false").lower() == "true"
+
+# Parallel rendering: default chunk count per job and max concurrent ffmpeg processes
+RENDER_CHUNKS = int(os.getenv("RENDER_CHUNKS", "1"))
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Incremental rendering: reuse encoded timeline pieces whose inputs are unchanged
+RENDER_INCREMENTAL = os.getenv("RENDER_INCREMENTAL", "false").lower() == "true"
+RENDER_SEGMENT_SECONDS = float(os.getenv("RENDER_SEGMENT_SECONDS", "10"))
+
+# Max concurrent S3 downloads per job
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "8"))
+
+# Streaming upload: write fragmented MP4 to a pipe and multipart-upload it while encoding
+RENDER_STREAM_UPLOAD = os.getenv("RENDER_STREAM_UPLOAD", "false").lower() == "true"
+
+# Decoded audio cache: resampled PCM of reused assets kept on local disk (0 disables)
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "audio-cache"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Inline audio: mix audio inside the final ffmpeg process instead of a separate AAC pass
+RENDER_INLINE_AUDIO = os.getenv("RENDER_INLINE_AUDIO", "false").lower() == "true"
+
 # In-memory job tracking
 jobs = {}
 
+# Blocking render stages run on a thread pool (JOB_CONCURRENCY renders at once)
+job_runner = runner_from_env(default_jobs=1)
+
+# Objects above one part size are transferred as parallel multipart parts / ranged GETs
+transfer_config = transfer_config_from_env()
+
+# Node-local asset cache shared with the other workers (ASSET_CACHE_DIR)
+asset_cache = cache_from_env(s3_client, transfer_config)
+
+# Downloads go next to the cache (same filesystem), so cache hits are hard links
+DOWNLOAD_DIR = download_dir(asset_cache)
+
+audio_cache = DecodedAudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES) if AUDIO_CACHE_MAX_BYTES > 0 else None
+
 
 class ExecuteRequest(BaseModel):
     jobId: str
@@ -53,27 +102,131 @@ class ExecuteResponse(BaseModel):
     message: Optional[str] = None
 
 
-def download_from_s3(s3_path: str, local_path: str):
-    """Download file from S3"""
+def parse_s3_path(s3_path: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)"""
     if not s3_path.startswith("s3://"):
         raise ValueError(f"Invalid S3 path: {s3_path}")
 
     path_parts = s3_path[5:].split("/", 1)
     bucket = path_parts[0]
     key = path_parts[1] if len(path_parts) > 1 else ""
+    return bucket, key
+
+
+def download_from_s3(s3_path: str, local_path: str):
+    """Download file from S3"""
+    bucket, key = parse_s3_path(s3_path)
+    if asset_cache:
+        asset_cache.download(s3_path, local_path)
+    else:
+        s3_client.download_file(bucket, key, local_path, Config=transfer_config)
+
+
+def get_object_hash(s3_path: str) -> str:
+    """ETag (content hash) of an S3 object, or the path itself if it is missing"""
+    bucket, key = parse_s3_path(s3_path)
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)["ETag"]
+    except ClientError:
+        # Missing assets fail later at download time; key on the path for now
+        return s3_path
+
+
+def get_object_hashes(s3_paths, prefetcher: AssetPrefetcher) -> Dict[str, str]:
+    """Map S3 paths to their ETags, looked up in parallel on the download pool"""
+    paths = sorted({s3_path for s3_path in s3_paths if s3_path and s3_path.startswith("s3://")})
+    return dict(zip(paths, prefetcher.map(get_object_hash, paths)))
+
+
+def get_asset_hashes(
+    unique_clips: Dict[str, List[Dict]], voice_outputs: Dict[str, str], prefetcher: AssetPrefetcher
+) -> Dict[str, str]:
+    """Map each S3 asset path used by the timeline (voice outputs included) to its ETag"""
+    return get_object_hashes(
+        [
+            s3_path
+            for clips in unique_clips.values()
+            for clip_data in clips
+            for s3_path in (clip_data["clip"].file_path, clip_data["clip"].audio_path)
+        ] + list(voice_outputs.values()),
+        prefetcher,
+    )
 
-    s3_client.download_file(bucket, key, local_path)
+
+async def fetch_job_outputs(job_ids: List[str], user_id: str) -> Dict[str, dict]:
+    """Look up outputs of the user's completed jobs with one backend request"""
+    import httpx
+
+    if not job_ids:
+        return {}
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{BACKEND_API_URL}/api/jobs/outputs",
+                json={"jobIds": job_ids, "userId": user_id},
+                headers={"X-Worker-API-Key": WORKER_API_KEY},
+                timeout=30.0,
+            )
+            response.raise_for_status()
+            found = response.json()["jobs"]
+    except Exception as e:
+        print(f"Failed to fetch job outputs: {e}")
+        return {}
+    return {job["id"]: job.get("output") or {} for job in found if job.get("status") == "completed"}
 
 
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """Upload file to S3 and return S3 path"""
     try:
-        s3_client.upload_file(file_path, BUCKET, s3_key)
+        s3_client.upload_file(file_path, BUCKET, s3_key, Config=transfer_config)
         return f"s3://{BUCKET}/{s3_key}"
     except ClientError as e:
         raise Exception(f"Failed to upload to S3: {e}")
 
 
+def upload_files_parallel(uploads: List[Tuple[str, str]]) -> List[str]:
+    """Upload (file_path, s3_key) pairs concurrently; returns S3 paths in order"""
+    with ThreadPoolExecutor(max_workers=max(len(uploads), 1)) as pool:
+        futures = [pool.submit(upload_to_s3, file_path, s3_key) for file_path, s3_key in uploads]
+        return [future.result() for future in futures]
+
+
+def run_ffmpeg_streaming_upload(stream: ffmpeg.Stream, local_path: str, s3_key: str) -> str:
+    """
+    Run an ffmpeg command that writes to stdout, saving its output locally and
+    multipart-uploading it to S3 as it is produced (upload overlaps encoding)
+    """
+    upload = MultipartStreamUpload(s3_client, BUCKET, s3_key, content_type="video/mp4")
+    process = stream.global_args("-loglevel", "error").run_async(pipe_stdout=True, overwrite_output=True)
+    try:
+        with open(local_path, "wb") as f:
+            while True:
+                chunk = process.stdout.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+                upload.write(chunk)
+        if process.wait() != 0:
+            raise Exception(f"ffmpeg exited with code {process.returncode}")
+        return upload.complete()
+    except Exception:
+        if process.poll() is None:
+            process.kill()
+        upload.abort()
+        raise
+
+
+def run_ffmpeg_parallel(streams: List[ffmpeg.Stream], max_workers: int):
+    """Run independent ffmpeg commands concurrently (each is its own process)"""
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        futures = [
+            pool.submit(ffmpeg.run, stream, overwrite_output=True, quiet=True)
+            for stream in streams
+        ]
+        for future in futures:
+            future.result()
+
+
 async def process_render(
     job_id: str,
     project_id: str,
@@ -82,122 +235,301 @@ async def process_render(
     resolution: Optional[str],
     watermark: bool,
     user_id: str,
+    render_chunks: int = 1,
+    profile: str = DEFAULT_PROFILE,
+    incremental: bool = False,
+    inline_audio: bool = False,
+    stream_upload: bool = False,
 ):
     """Process video rendering in background"""
+    prefetcher = None
     try:
         # Update status to processing
         jobs[job_id] = {"status": "processing", "progress": 10}
         await update_backend_status(job_id, 10, "processing")
 
-        # Resolve timeline
-        timeline_settings = timeline.get("settings", {})
-        fps = timeline_settings.get("fps", 30.0)
+        # Parse timeline once; all renderer components share the model
+        timeline_model = Timeline.parse(timeline)
+        fps = timeline_model.settings.get("fps", 30.0)
         
-        resolver = TimelineResolver(timeline, fps=fps)
-        resolved_frames = resolver.resolve()
-        dependencies = resolver.get_asset_dependencies()
+        resolver = TimelineResolver(timeline_model, fps=fps)
+        segments = resolver.resolve_segments()
         
+        # Determine resolution
+        if not resolution:
+            if format == "16:9":
+                resolution = (1920, 1080)
+            elif format == "9:16":
+                resolution = (1080, 1920)
+            else:  # 1:1
+                resolution = (1080, 1080)
+        else:
+            # Parse "1920x1080" format
+            w, h = map(int, resolution.split("x"))
+            resolution = (w, h)
+
+        # Draft/preview profiles render at reduced resolution and fps
+        resolution, fps = apply_profile(profile, resolution, fps)
+
+        temp_dir = tempfile.gettempdir()
+        prefetcher = AssetPrefetcher(download_from_s3, DOWNLOAD_DIR, DOWNLOAD_CONCURRENCY)
+
+        # Resolve voice-clone audio with one backend lookup (before the cache key,
+        # so a voice job completing after a cached render invalidates it)
+        unique_clips = resolver.get_unique_clips()
+        audio_clips = unique_clips["audio"]
+        voice_job_ids = sorted({d["clip"].voice_job_id for d in audio_clips if d["clip"].voice_job_id})
+        voice_outputs = {
+            voice_job_id: output["filePath"]
+            for voice_job_id, output in (await fetch_job_outputs(voice_job_ids, user_id)).items()
+            if output.get("filePath")
+        }
+        for voice_job_id in voice_job_ids:
+            if voice_job_id not in voice_outputs:
+                print(f"Voice job {voice_job_id} has no completed output; using clip audio track")
+
+        # Return an identical earlier render straight from the cache
+        asset_hashes = await job_runner.run(get_asset_hashes, unique_clips, voice_outputs, prefetcher)
+        # Ducking is only applied by the NumPy mixer, so it overrides inline audio
+        audio_mix = "inline" if inline_audio and not AudioComposer.clips_duck(audio_clips) else "compose"
+        render_key = compute_render_key(
+            segments,
+            asset_hashes,
+            resolution,
+            fps,
+            profile,
+            inline_audio=inline_audio,
+            audio_mix=audio_mix,
+            voice_outputs=voice_outputs,
+        )
+        render_cache = RenderCache(
+            s3_client, BUCKET, f"users/{user_id}/projects/{project_id}/renders/cache"
+        )
+        cached_output = await job_runner.run(render_cache.lookup, render_key)
+        if cached_output:
+            await job_runner.run(prefetcher.close)
+            output = {**cached_output, "format": format, "watermark": watermark, "cached": True}
+            jobs[job_id] = {"status": "completed", "progress": 100, "output": output}
+            await update_backend_status(job_id, 100, "completed", output)
+            return
+
         jobs[job_id]["progress"] = 20
         await update_backend_status(job_id, 20, "processing")
 
-        # Download assets
-        # TODO: Download videos, audio, subtitles from S3 based on dependencies
-        # For now, assume first video clip is the main video
-        main_video_path = None
-        if dependencies["videos"]:
-            # Get video path from clip
-            # TODO: Resolve from database
-            pass
+        if not unique_clips["video"]:
+            raise ValueError("No video clips found in timeline")
+        # The API fills filePath in from the Clip model; without it there is nothing to decode
+        missing_sources = [d["clip"].id for d in unique_clips["video"] if not d["clip"].file_path]
+        if missing_sources:
+            raise ValueError(f"Video clips without a source filePath: {', '.join(missing_sources)}")
+
+        # Incremental render: fetch unchanged pieces from the segment cache so
+        # only sources used by changed pieces need downloading and encoding
+        pieces = []
+        piece_keys = []
+        cached_parts = {}
+        # Parts are MPEG-TS unless the profile's codec needs another container
+        _, part_ext = part_format(profile)
+        if incremental:
+            segment_cache = SegmentCache(
+                s3_client,
+                BUCKET,
+                f"users/{user_id}/projects/{project_id}/renders/segments",
+                transfer_config,
+                extension=part_ext,
+            )
+            pieces = resolver.render_pieces(int(RENDER_SEGMENT_SECONDS * 1000))
+            piece_keys = [compute_piece_key(piece, asset_hashes, resolution, fps, profile) for piece in pieces]
+            piece_paths = [
+                os.path.join(temp_dir, f"piece_{uuid.uuid4()}_{idx}{part_ext}") for idx in range(len(pieces))
+            ]
+            hits = await job_runner.gather(
+                [functools.partial(segment_cache.fetch, key, path) for key, path in zip(piece_keys, piece_paths)],
+                DOWNLOAD_CONCURRENCY,
+            )
+            cached_parts = {idx: path for idx, (path, hit) in enumerate(zip(piece_paths, hits)) if hit}
+            needed_sources = {
+                clip_data["clip"].file_path
+                for idx, piece in enumerate(pieces)
+                if idx not in cached_parts
+                for clip_data in piece.video_clips
+            }
+        else:
+            needed_sources = {clip_data["clip"].file_path for clip_data in unique_clips["video"]}
+
+        audio_assets = [
+            AudioComposer.asset_path(d["clip"], voice_outputs) for d in audio_clips if not d["track"].muted
+        ]
+        source_assets = [
+            d["clip"].file_path for d in unique_clips["video"] if d["clip"].file_path in needed_sources
+        ]
+
+        # Prefetch stage: each distinct asset downloaded once, audio queued ahead of
+        # video so composition can start while source videos are still downloading
+        prefetcher.prefetch(audio_assets, "audio")
+        if not S3_STREAM_SOURCES:
+            prefetcher.prefetch(source_assets, "source")
 
         jobs[job_id]["progress"] = 30
         await update_backend_status(job_id, 30, "processing")
 
-        # Compose audio
-        audio_clips = []
-        for frame in resolved_frames:
-            audio_clips.extend(frame.audio_clips)
+        # Compose audio (each clip placement passed once)
+        audio_paths = await job_runner.run(prefetcher.wait, audio_assets)
         
-        temp_dir = tempfile.gettempdir()
         audio_output = os.path.join(temp_dir, f"audio_{uuid.uuid4()}.aac")
-        composer = AudioComposer(audio_clips, audio_output)
-        composed_audio = composer.compose()
+        composer = AudioComposer(
+            audio_clips,
+            audio_output,
+            asset_hashes=asset_hashes,
+            audio_cache=audio_cache,
+            voice_outputs=voice_outputs,
+            local_paths=audio_paths,
+        )
+        if audio_mix == "inline":
+            # Mix graph goes into the final encode: sources read once, audio encoded once
+            audio_stream = composer.build_stream(duration=timeline_model.duration)
+            composed_audio = None
+        else:
+            audio_stream = None
+            composed_audio = await job_runner.run(composer.compose)
         
         jobs[job_id]["progress"] = 50
         await update_backend_status(job_id, 50, "processing")
 
         # Render subtitles
-        subtitle_clips = []
-        for frame in resolved_frames:
-            subtitle_clips.extend(frame.subtitles)
+        subtitle_clips = unique_clips["subtitle"]
         
         subtitle_output = None
         if subtitle_clips:
             subtitle_path = os.path.join(temp_dir, f"subtitles_{uuid.uuid4()}.ass")
             renderer = SubtitleRenderer(subtitle_clips, subtitle_path)
-            subtitle_output = renderer.render_ass()
+            subtitle_output = await job_runner.run(renderer.render_ass)
+        
+        # Source videos (one local copy per distinct source file)
+        if S3_STREAM_SOURCES:
+            # ffmpeg seeks to each trimmed range, so only the bytes actually used are fetched
+            source_paths = {s3_path: presign_s3_url(s3_client, s3_path) for s3_path in source_assets}
+        else:
+            source_paths = await job_runner.run(prefetcher.wait, source_assets)
         
         jobs[job_id]["progress"] = 70
         await update_backend_status(job_id, 70, "processing")
 
-        # Determine resolution
-        if not resolution:
-            if format == "16:9":
-                resolution = (1920, 1080)
-            elif format == "9:16":
-                resolution = (1080, 1920)
-            else:  # 1:1
-                resolution = (1080, 1080)
-        else:
-            # Parse "1920x1080" format
-            w, h = map(int, resolution.split("x"))
-            resolution = (w, h)
-
         # Build FFmpeg command
         video_output = os.path.join(temp_dir, f"output_{uuid.uuid4()}.mp4")
-        
-        # For now, use first video clip
-        # TODO: Handle multi-clip composition
-        if not main_video_path:
-            raise ValueError("No video clips found in timeline")
+        video_s3_key = f"users/{user_id}/projects/{project_id}/renders/{uuid.uuid4()}.mp4"
         
         builder = FFmpegBuilder(
-            video_clips=[main_video_path],
+            video_clips=list(source_paths.values()),
             audio_path=composed_audio,
             subtitle_path=subtitle_output,
-            output_path=video_output,
+            output_path="pipe:" if stream_upload else video_output,
             resolution=resolution,
             fps=fps,
             format=format,
+            profile=profile,
+            audio_stream=audio_stream,
+            fragmented=stream_upload,
         )
         
-        stream = builder.build()
+        # Stream-copy plain cuts when sources already match the output format
+        # (planning probes sources and their keyframes)
+        parts = [] if incremental else await job_runner.run(builder.plan_parts, segments, source_paths)
+        part_streams = []
+        part_paths = []
+        new_pieces = []
+        if incremental:
+            # Encode only pieces that missed the segment cache
+            for idx, piece in enumerate(pieces):
+                if idx in cached_parts:
+                    part_paths.append(cached_parts[idx])
+                    continue
+                part_path = os.path.join(temp_dir, f"piece_{uuid.uuid4()}_{idx}{part_ext}")
+                part_streams.append(builder.build_part(RenderPart("compose", piece), source_paths, part_path))
+                part_paths.append(part_path)
+                new_pieces.append((piece_keys[idx], part_path))
+        elif any(part.mode == "copy" for part in parts):
+            if render_chunks > 1:
+                # Copy parts already avoid most encoding; chunking would re-encode them
+                print(f"Stream-copy parts available; ignoring chunks={render_chunks}")
+            for idx, part in enumerate(parts):
+                part_path = os.path.join(temp_dir, f"part_{uuid.uuid4()}_{idx}{part_ext}")
+                part_streams.append(builder.build_part(part, source_paths, part_path))
+                part_paths.append(part_path)
+        elif render_chunks > 1:
+            # Chunked render: GOP-aligned time ranges encoded in parallel
+            gop_ms = int(FFmpegBuilder.GOP_SECONDS * 1000)
+            chunk_threads = max((os.cpu_count() or 1) // render_chunks, 1)
+            for idx, (start_ms, end_ms) in enumerate(resolver.chunk_ranges(render_chunks, gop_ms)):
+                part_path = os.path.join(temp_dir, f"chunk_{uuid.uuid4()}_{idx}{part_ext}")
+                chunk_builder = FFmpegBuilder(
+                    video_clips=list(source_paths.values()),
+                    audio_path=None,
+                    subtitle_path=subtitle_output,
+                    output_path=part_path,
+                    resolution=resolution,
+                    fps=fps,
+                    format=format,
+                    threads=chunk_threads,
+                    profile=profile,
+                )
+                part_streams.append(chunk_builder.build_multi_clip(
+                    resolver.segments_in_range(start_ms, end_ms),
+                    source_paths,
+                    time_offset=start_ms / 1000,
+                ))
+                part_paths.append(part_path)
+        
+        if part_paths:
+            await job_runner.run(run_ffmpeg_parallel, part_streams, RENDER_CONCURRENCY)
+            await job_runner.gather(
+                [functools.partial(segment_cache.store, piece_key, part_path) for piece_key, part_path in new_pieces],
+                DOWNLOAD_CONCURRENCY,
+            )
+            
+            # Lossless join, composed audio muxed once
+            list_path = os.path.join(temp_dir, f"parts_{uuid.uuid4()}.txt")
+            stream = builder.build_concat(part_paths, list_path)
+        else:
+            # Whole timeline in one ffmpeg process, one decode per source
+            stream = builder.build_multi_clip(segments, source_paths)
         
         # Run FFmpeg
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        video_s3_path = None
+        if stream_upload:
+            video_s3_path = await job_runner.run(run_ffmpeg_streaming_upload, stream, video_output, video_s3_key)
+        else:
+            await job_runner.run(ffmpeg.run, stream, overwrite_output=True, quiet=True)
+        if part_paths:
+            for path in [*part_paths, list_path]:
+                if os.path.exists(path):
+                    os.remove(path)
         
         jobs[job_id]["progress"] = 90
         await update_backend_status(job_id, 90, "processing")
 
         # Generate thumbnail
         thumbnail_path = os.path.join(temp_dir, f"thumb_{uuid.uuid4()}.jpg")
-        (
+        thumbnail = (
             ffmpeg
             .input(video_output, ss=1)  # Frame at 1 second
             .output(thumbnail_path, vframes=1, qscale=2)
-            .overwrite_output()
-            .run(quiet=True)
         )
+        await job_runner.run(ffmpeg.run, thumbnail, overwrite_output=True, quiet=True)
 
-        # Upload to S3
-        video_s3_key = f"users/{user_id}/projects/{project_id}/renders/{uuid.uuid4()}.mp4"
-        video_s3_path = upload_to_s3(video_output, video_s3_key)
-        
+        # Upload to S3 (video and thumbnail in parallel unless the video already streamed up)
         thumbnail_s3_key = f"users/{user_id}/projects/{project_id}/thumbnails/{uuid.uuid4()}.jpg"
-        thumbnail_s3_path = upload_to_s3(thumbnail_path, thumbnail_s3_key)
+        if video_s3_path:
+            thumbnail_s3_path = await job_runner.run(upload_to_s3, thumbnail_path, thumbnail_s3_key)
+        else:
+            video_s3_path, thumbnail_s3_path = await job_runner.run(upload_files_parallel, [
+                (video_output, video_s3_key),
+                (thumbnail_path, thumbnail_s3_key),
+            ])
 
         # Get file size and duration
         import subprocess
-        probe = ffmpeg.probe(video_output)
+        probe = await job_runner.run(ffmpeg.probe, video_output)
         duration = float(probe["format"]["duration"])
         file_size = int(probe["format"]["size"])
 
@@ -205,6 +537,7 @@ async def process_render(
         for path in [video_output, composed_audio, thumbnail_path]:
             if path and os.path.exists(path):
                 os.remove(path)
+        await job_runner.run(prefetcher.close)
         if subtitle_output and os.path.exists(subtitle_output):
             os.remove(subtitle_output)
 
@@ -217,7 +550,9 @@ async def process_render(
             "format": format,
             "resolution": f"{resolution[0]}x{resolution[1]}",
             "watermark": watermark,
+            "profile": profile,
         }
+        await job_runner.run(render_cache.store, render_key, output)
 
         jobs[job_id] = {"status": "completed", "progress": 100, "output": output}
         await update_backend_status(job_id, 100, "completed", output)
@@ -227,6 +562,8 @@ async def process_render(
         print(f"Error in render: {error_msg}")
         import traceback
         traceback.print_exc()
+        if prefetcher:
+            await job_runner.run(prefetcher.close)
         jobs[job_id] = {"status": "failed", "progress": 0, "error": error_msg}
         await update_backend_status(job_id, 0, "failed", None, error_msg)
 
@@ -283,9 +620,17 @@ async def execute(
         )
 
     user_id = request.input.get("userId", "unknown")
+    render_chunks = int(request.input.get("chunks") or RENDER_CHUNKS)
+    profile = request.input.get("profile", DEFAULT_PROFILE)
+    if profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown render profile: {profile}")
+    incremental = bool(request.input.get("incremental", RENDER_INCREMENTAL))
+    inline_audio = bool(request.input.get("inlineAudio", RENDER_INLINE_AUDIO))
+    stream_upload = bool(request.input.get("streamUpload", RENDER_STREAM_UPLOAD))
 
     # Start background task
     background_tasks.add_task(
+        job_runner.submit,
         process_render,
         request.jobId,
         project_id,
@@ -294,6 +639,11 @@ async def execute(
         resolution,
         watermark,
         user_id,
+        render_chunks,
+        profile,
+        incremental,
+        inline_audio,
+        stream_upload,
     )
 
     return ExecuteResponse(jobId=request.jobId, status="accepted")
@@ -302,9 +652,9 @@ async def execute(
 @app.get("/health")
 async def health():
     """Health check - worker contract endpoint"""
-    # Check FFmpeg availability
+    # Check FFmpeg availability (default executor, so a busy job pool can't delay it)
     try:
-        ffmpeg.probe("anullsrc", format="lavfi")
+        await asyncio.to_thread(ffmpeg.probe, "anullsrc", format="lavfi")
         ffmpeg_available = True
     except:
         ffmpeg_available = False
@@ -312,6 +662,7 @@ async def health():
     return {
         "status": "healthy" if ffmpeg_available else "unhealthy",
         "ffmpeg_available": ffmpeg_available,
+        "jobs": job_runner.stats(),
         "version": "1.0.0",
     }
 
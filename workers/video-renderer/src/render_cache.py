@@ -0,0 +1,198 @@
+"""
+Render Cache
+Content-addressed cache of finished renders, stored in S3 alongside the renders
+Key = hash of resolved timeline + asset content hashes + output settings
+"""
+
+import hashlib
+import json
+from typing import List, Dict, Any, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+CACHE_VERSION = 2  # Bump when renderer output changes for the same inputs
+
+
+def _clip_key(
+    clip: Any,
+    asset_hashes: Dict[str, str],
+    segment_start_ms: int,
+    voice_outputs: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Render-relevant fields of a clip (ids and UI-only fields are left out)
+    voice_outputs maps voiceJobId to the job's output audio; a clip whose job
+    has no output yet falls back to its audio track, so the resolved output is
+    keyed too and a later-completed voice job changes the key.
+    """
+    voice_output = (voice_outputs or {}).get(clip.voice_job_id)
+    return {
+        "source": asset_hashes.get(clip.file_path, clip.file_path),
+        "audio": asset_hashes.get(clip.audio_path, clip.audio_path),
+        "voiceJobId": clip.voice_job_id,
+        "voiceOutput": [voice_output, asset_hashes.get(voice_output)] if voice_output else None,
+        # Source time shown at the segment start, independent of timeline position
+        "sourceOffsetMs": clip.source_start_ms + (segment_start_ms - clip.start_ms),
+        "position": clip.position,
+        "scale": clip.scale,
+        "opacity": clip.opacity,
+        "fadeInMs": clip.fade_in_ms,
+        "fadeOutMs": clip.fade_out_ms,
+        "transformations": [t for t in clip.transformations if t.get("status") == "completed"],
+        "subtitles": clip.subtitles,
+    }
+
+
+def segment_key(
+    segment: Any, asset_hashes: Dict[str, str], voice_outputs: Optional[Dict[str, str]] = None
+) -> List[Any]:
+    """Canonical description of one edit segment"""
+    start = segment.start_ms
+    return [
+        start,
+        segment.end_ms,
+        [_clip_key(d["clip"], asset_hashes, start) for d in segment.video_clips],
+        [
+            [_clip_key(d["clip"], asset_hashes, start, voice_outputs), d["track"].volume, d["track"].muted, d["track"].is_voice, d["track"].ducking]
+            for d in segment.audio_clips
+        ],
+        [_clip_key(d["clip"], asset_hashes, start) for d in segment.subtitles],
+    ]
+
+
+def hash_key(payload: Any) -> str:
+    """SHA-256 of canonical JSON"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compute_render_key(
+    segments: List[Any],
+    asset_hashes: Dict[str, str],
+    resolution: Tuple[int, int],
+    fps: float,
+    profile: str,
+    inline_audio: bool = False,
+    audio_mix: str = "compose",
+    voice_outputs: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Key for a full render
+    asset_hashes maps S3 paths to content hashes (ETags), so re-uploaded
+    assets at the same path invalidate the cache; voice_outputs are the
+    resolved voice-job audio paths (see _clip_key). audio_mix is the mixer that
+    actually ran ("inline" amix graph or NumPy "compose"); the two differ in
+    output. The watermark flag is not part of the key because the renderer
+    does not draw one yet.
+    """
+    return hash_key({
+        "version": CACHE_VERSION,
+        "segments": [segment_key(segment, asset_hashes, voice_outputs) for segment in segments],
+        "resolution": list(resolution),
+        "fps": fps,
+        "profile": profile,
+        "inlineAudio": inline_audio,
+        "audioMix": audio_mix,
+    })
+
+
+def compute_piece_key(
+    piece: Any,
+    asset_hashes: Dict[str, str],
+    resolution: Tuple[int, int],
+    fps: float,
+    profile: str,
+) -> str:
+    """
+    Key for one encoded video-only piece (see TimelineResolver.render_pieces)
+    Only the piece's own content is hashed - not its position on the timeline -
+    so pieces survive edits elsewhere, including ones that shift them.
+    """
+    start = piece.start_ms
+    return hash_key({
+        "version": CACHE_VERSION,
+        "durationMs": piece.end_ms - start,
+        "layers": [_clip_key(d["clip"], asset_hashes, start) for d in piece.video_clips],
+        "subtitles": [
+            [_clip_key(d["clip"], asset_hashes, start), d["clip"].start_ms - start, d["clip"].end_ms - start]
+            for d in piece.subtitles
+        ],
+        "resolution": list(resolution),
+        "fps": fps,
+        "profile": profile,
+    })
+
+
+class RenderCache:
+    """Looks up and records finished renders by content key"""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}.json"
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Return cached job output, or None if missing or the render was deleted"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._entry_key(key))
+            output = json.loads(response["Body"].read())
+        except (ClientError, ValueError):
+            return None
+
+        # Make sure the cached render still exists
+        for field in ("filePath", "thumbnailPath"):
+            s3_path = output.get(field)
+            if not s3_path or not s3_path.startswith("s3://"):
+                return None
+            bucket, _, object_key = s3_path[5:].partition("/")
+            try:
+                self.s3_client.head_object(Bucket=bucket, Key=object_key)
+            except ClientError:
+                return None
+        return output
+
+    def store(self, key: str, output: Dict):
+        """Record job output for a render key"""
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._entry_key(key),
+                Body=json.dumps(output).encode("utf-8"),
+                ContentType="application/json",
+            )
+        except ClientError as e:
+            print(f"Failed to write render cache entry: {e}")
+
+
+class SegmentCache:
+    """Stores encoded render pieces in S3 by content key"""
+
+    def __init__(
+        self, s3_client: Any, bucket: str, prefix: str, transfer_config: Any = None, extension: str = ".ts"
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.transfer_config = transfer_config
+        self.extension = extension  # Of the profile's part container (see render_profiles.part_format)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}{self.extension}"
+
+    def fetch(self, key: str, local_path: str) -> bool:
+        """Download a cached piece; returns False on a miss"""
+        try:
+            self.s3_client.download_file(self.bucket, self._object_key(key), local_path, Config=self.transfer_config)
+            return True
+        except ClientError:
+            return False
+
+    def store(self, key: str, local_path: str):
+        """Upload an encoded piece"""
+        try:
+            self.s3_client.upload_file(local_path, self.bucket, self._object_key(key), Config=self.transfer_config)
+        except ClientError as e:
+            print(f"Failed to write render segment to cache: {e}")
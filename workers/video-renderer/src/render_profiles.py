@@ -0,0 +1,74 @@
+"""
+Render Profiles
+Named speed/quality tiers for the video encode
+Draft/preview trade quality for turnaround so they don't compete with final renders for CPU
+"""
+
+from typing import Dict, Any, Tuple
+
+DEFAULT_PROFILE = "final"
+
+RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Quick turnaround: half resolution, capped fps, fastest x264 settings
+    "draft": {
+        "encoder": {"vcodec": "libx264", "preset": "ultrafast", "tune": "fastdecode", "crf": 32},
+        "audio_bitrate": "96k",
+        "scale": 0.5,
+        "max_fps": 15,
+    },
+    # Interactive preview: reduced resolution, fast-decoding x264
+    "preview": {
+        "encoder": {"vcodec": "libx264", "preset": "veryfast", "tune": "fastdecode", "crf": 26},
+        "audio_bitrate": "128k",
+        "scale": 0.5,
+        "max_fps": 30,
+    },
+    # Final export (previous hard-coded settings)
+    "final": {
+        "encoder": {"vcodec": "libx264", "preset": "medium", "crf": 23},
+        "audio_bitrate": "192k",
+    },
+    # Final export, smaller files at higher encode cost
+    "final_hevc": {
+        "encoder": {"vcodec": "libx265", "preset": "medium", "crf": 28, "tag:v": "hvc1"},
+        "audio_bitrate": "192k",
+    },
+    "final_vp9": {
+        "encoder": {"vcodec": "libvpx-vp9", "crf": 32, "b:v": 0, "deadline": "good", "cpu-used": 2, "row-mt": 1},
+        "audio_bitrate": "192k",
+        "part_format": "matroska",  # MPEG-TS cannot carry VP9
+    },
+}
+
+# Container of chunked/incremental render parts (joined with the concat demuxer)
+DEFAULT_PART_FORMAT = "mpegts"
+PART_EXTENSIONS = {"mpegts": ".ts", "matroska": ".mkv"}
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    """Get render profile by name"""
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return RENDER_PROFILES[name]
+
+
+def part_format(name: str) -> Tuple[str, str]:
+    """(ffmpeg format, file extension) of the profile's render parts"""
+    fmt = get_profile(name).get("part_format", DEFAULT_PART_FORMAT)
+    return fmt, PART_EXTENSIONS[fmt]
+
+
+def apply_profile(name: str, resolution: Tuple[int, int], fps: float) -> Tuple[Tuple[int, int], float]:
+    """Return output (resolution, fps) after the profile's downscale and fps cap"""
+    profile = get_profile(name)
+    scale = profile.get("scale", 1.0)
+    if scale != 1.0:
+        # Encoders need even dimensions for yuv420p
+        resolution = (
+            max(int(resolution[0] * scale) // 2 * 2, 2),
+            max(int(resolution[1] * scale) // 2 * 2, 2),
+        )
+    max_fps = profile.get("max_fps")
+    if max_fps and fps > max_fps:
+        fps = float(max_fps)
+    return resolution, fps
@@ -4,10 +4,12 @@ Renders subtitles as ASS format for burn-in or sidecar export
 """
 
 import pysrt
-from typing import List, Dict, Any
+from typing import List, Dict, Optional
 import tempfile
 import os
 
+from timeline_model import TimelineClip
+
 
 class SubtitleRenderer:
     """Renders subtitles from timeline and SRT files"""
@@ -37,7 +39,7 @@ class SubtitleRenderer:
         # Sort subtitles by start time
         sorted_subs = sorted(
             self.subtitles,
-            key=lambda x: x["clip"].startTime
+            key=lambda x: x["clip"].start_ms
         )
         
         for sub_data in sorted_subs:
@@ -47,11 +49,8 @@ class SubtitleRenderer:
             if not text:
                 continue
             
-            clip_start = clip.get("startTime", 0) if isinstance(clip, dict) else (getattr(clip, "startTime", 0) if hasattr(clip, "startTime") else 0)
-            clip_duration = clip.get("duration", 0) if isinstance(clip, dict) else (getattr(clip, "duration", 0) if hasattr(clip, "duration") else 0)
-            
-            start_time = self._format_ass_time(clip_start)
-            end_time = self._format_ass_time(clip_start + clip_duration)
+            start_time = self._format_ass_time(clip.start)
+            end_time = self._format_ass_time(clip.end)
             
             ass_lines.append(
                 f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}"
@@ -63,21 +62,13 @@ class SubtitleRenderer:
         
         return self.output_path
     
-    def _get_subtitle_text(self, clip: Any) -> str:
+    def _get_subtitle_text(self, clip: TimelineClip) -> Optional[str]:
         """Get subtitle text from clip"""
-        # Handle dict or object
-        if isinstance(clip, dict):
-            # Check if clip has subtitle data
-            if clip.get("subtitles"):
-                # Get text for current time
-                # TODO: Extract from subtitle segments
-                return "Subtitle text"  # Placeholder
-        else:
-            # Check if clip has subtitle data
-            if hasattr(clip, "subtitles") and clip.subtitles:
-                # Get text for current time
-                # TODO: Extract from subtitle segments
-                return "Subtitle text"  # Placeholder
+        # Check if clip has subtitle data
+        if clip.subtitles:
+            # Get text for current time
+            # TODO: Extract from subtitle segments
+            return "Subtitle text"  # Placeholder
         
         return None
     
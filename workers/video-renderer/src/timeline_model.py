@@ -0,0 +1,156 @@
+"""
+Timeline Model
+Parses timeline JSON once into compact clip/track objects shared by all renderer components
+Times are pre-converted to integer millisecond ticks
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+TICKS_PER_SECOND = 1000
+
+
+def to_ticks(seconds: Optional[float]) -> int:
+    """Convert seconds to integer millisecond ticks"""
+    return int(round(float(seconds or 0) * TICKS_PER_SECOND))
+
+
+def _field(source: Any, key: str, default: Any = None) -> Any:
+    """Read a field from a dict or object (only used while parsing)"""
+    if isinstance(source, dict):
+        return source.get(key, default)
+    return getattr(source, key, default)
+
+
+class TimelineClip:
+    """Clip placement on a track, with times in millisecond ticks"""
+    __slots__ = (
+        "id",
+        "clip_id",
+        "file_path",
+        "start_ms",
+        "duration_ms",
+        "end_ms",
+        "source_start_ms",
+        "source_end_ms",
+        "transformations",
+        "position",
+        "scale",
+        "opacity",
+        "fade_in_ms",
+        "fade_out_ms",
+        "voice_id",
+        "voice_job_id",
+        "character_id",
+        "face_track_id",
+        "audio_track",
+        "subtitles",
+        "raw",
+    )
+
+    def __init__(self, raw: Any):
+        self.raw = raw
+        self.clip_id: str = _field(raw, "clipId", "") or ""
+        self.id: str = _field(raw, "id", None) or self.clip_id
+        # Source video (denormalized from the Clip model like audioTrack/subtitles)
+        self.file_path: Optional[str] = _field(raw, "filePath", None)
+        self.start_ms: int = to_ticks(_field(raw, "startTime", 0))
+        self.duration_ms: int = to_ticks(_field(raw, "duration", 0))
+        self.end_ms: int = self.start_ms + self.duration_ms
+        self.source_start_ms: int = to_ticks(_field(raw, "sourceStartTime", 0))
+        source_end = _field(raw, "sourceEndTime", None)
+        self.source_end_ms: Optional[int] = to_ticks(source_end) if source_end is not None else None
+        self.transformations: List[Dict] = list(_field(raw, "transformations", None) or [])
+        position = _field(raw, "position", None)
+        self.position: Optional[Tuple[int, int]] = (
+            (int(_field(position, "x", 0)), int(_field(position, "y", 0))) if position else None
+        )
+        self.scale: float = float(_field(raw, "scale", 1.0) or 1.0)
+        opacity = _field(raw, "opacity", None)
+        self.opacity: float = 1.0 if opacity is None else float(opacity)
+        self.fade_in_ms: int = to_ticks(_field(raw, "fadeIn", 0))
+        self.fade_out_ms: int = to_ticks(_field(raw, "fadeOut", 0))
+        self.voice_id: Optional[str] = _field(raw, "voiceId", None)
+        self.voice_job_id: Optional[str] = _field(raw, "voiceJobId", None)
+        self.character_id: Optional[str] = _field(raw, "characterId", None)
+        self.face_track_id: Optional[str] = _field(raw, "faceTrackId", None)
+        self.audio_track: Optional[Dict] = _field(raw, "audioTrack", None)
+        self.subtitles: List[Any] = list(_field(raw, "subtitles", None) or [])
+
+    @property
+    def start(self) -> float:
+        return self.start_ms / TICKS_PER_SECOND
+
+    @property
+    def duration(self) -> float:
+        return self.duration_ms / TICKS_PER_SECOND
+
+    @property
+    def end(self) -> float:
+        return self.end_ms / TICKS_PER_SECOND
+
+    @property
+    def source_start(self) -> float:
+        return self.source_start_ms / TICKS_PER_SECOND
+
+    @property
+    def audio_path(self) -> Optional[str]:
+        """S3 path of the clip's audio track, if any"""
+        if not self.audio_track:
+            return None
+        return _field(self.audio_track, "filePath", None) or None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Read a raw timeline field that is not part of the model"""
+        return _field(self.raw, key, default)
+
+
+class TimelineTrack:
+    """Track with its parsed clips"""
+    __slots__ = ("id", "type", "role", "clips", "muted", "locked", "volume", "ducking", "raw")
+
+    def __init__(self, raw: Any):
+        self.raw = raw
+        self.id: Optional[str] = _field(raw, "id", None)
+        self.type: str = _field(raw, "type", "video") or "video"
+        # Audio tracks: "voice" | "music" | "effects" (None = infer from clips)
+        self.role: Optional[str] = _field(raw, "role", None)
+        self.clips: Tuple[TimelineClip, ...] = tuple(
+            TimelineClip(clip) for clip in (_field(raw, "clips", None) or [])
+        )
+        self.muted: bool = bool(_field(raw, "muted", False))
+        self.locked: bool = bool(_field(raw, "locked", False))
+        volume = _field(raw, "volume", None)
+        self.volume: float = 1.0 if volume is None else float(volume)
+        self.ducking: Optional[Dict] = _field(raw, "ducking", None)
+
+    @property
+    def is_voice(self) -> bool:
+        """Voice track (explicit role, or any clip carrying a voice)"""
+        if self.role is not None:
+            return self.role == "voice"
+        return any(clip.voice_id or clip.voice_job_id for clip in self.clips)
+
+
+class Timeline:
+    """Parsed timeline - build once with Timeline.parse() and share between components"""
+    __slots__ = ("duration_ms", "format", "tracks", "settings", "raw")
+
+    def __init__(self, raw: Any):
+        self.raw = raw
+        self.duration_ms: int = to_ticks(_field(raw, "duration", 0))
+        self.format: str = _field(raw, "format", "16:9") or "16:9"
+        self.settings: Dict = _field(raw, "settings", None) or {}
+        self.tracks: Tuple[TimelineTrack, ...] = tuple(
+            TimelineTrack(track) for track in (_field(raw, "tracks", None) or [])
+        )
+
+    @classmethod
+    def parse(cls, timeline: Any) -> "Timeline":
+        """Return timeline as a Timeline model (no-op if already parsed)"""
+        if isinstance(timeline, cls):
+            return timeline
+        return cls(timeline)
+
+    @property
+    def duration(self) -> float:
+        return self.duration_ms / TICKS_PER_SECOND
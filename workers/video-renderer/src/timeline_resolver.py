@@ -3,12 +3,16 @@ Timeline Resolver
 Converts declarative timeline JSON into frame-level execution plan
 """
 
-from typing import List, Dict, Any
-# Timeline types will be passed as dict from backend
+from bisect import bisect_right
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from timeline_model import Timeline, TimelineClip, TICKS_PER_SECOND
 
 
 class ResolvedFrame:
     """Single frame execution plan"""
+    __slots__ = ("frame_number", "timestamp", "video_clips", "audio_clips", "subtitles", "transformations")
+
     def __init__(self):
         self.frame_number: int = 0
         self.timestamp: float = 0.0
@@ -18,100 +22,258 @@ class ResolvedFrame:
         self.transformations: List[Dict] = []  # Transformations to apply
 
 
+class EditSegment:
+    """Time range [start, end) over which the set of active clips is constant"""
+    def __init__(self, start_ms: int, end_ms: int):
+        self.start_ms: int = start_ms
+        self.end_ms: int = end_ms
+        self.video_clips: List[Dict] = []  # Video clips active in this segment
+        self.audio_clips: List[Dict] = []  # Audio clips active in this segment
+        self.subtitles: List[Dict] = []  # Subtitles active in this segment
+        self.transformations: List[Dict] = []  # Transformations to apply
+
+    @property
+    def start(self) -> float:
+        return self.start_ms / TICKS_PER_SECOND
+
+    @property
+    def end(self) -> float:
+        return self.end_ms / TICKS_PER_SECOND
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ms - self.start_ms) / TICKS_PER_SECOND
+
+    def is_empty(self) -> bool:
+        """True for gaps with nothing on any track"""
+        return not (self.video_clips or self.audio_clips or self.subtitles)
+
+
 class TimelineResolver:
-    """Resolves timeline into frame-by-frame execution plan"""
-    
-    def __init__(self, timeline: Dict, fps: float = 30.0):
-        self.timeline = timeline
+    """Resolves timeline into frame-by-frame or segment-level execution plan"""
+
+    def __init__(self, timeline: Any, fps: float = 30.0):
+        self.timeline = Timeline.parse(timeline)
         self.fps = fps
-        self.total_frames = int(timeline.get("duration", 0) * fps)
-    
+        self.total_frames = int(self.timeline.duration * fps)
+        self._segments: Optional[List[EditSegment]] = None
+        self._segment_starts: List[float] = []
+
     def resolve(self) -> List[ResolvedFrame]:
-        """Convert timeline to frame-level plan"""
-        frames = []
-        
-        for frame_num in range(self.total_frames):
+        """Convert timeline to frame-level plan (materializes every frame)"""
+        return list(self.iter_frames())
+
+    def iter_frames(self, start: int = 0, end: Optional[int] = None) -> Iterator[ResolvedFrame]:
+        """
+        Lazily yield frame plans for frames [start, end)
+        Walks the pre-sorted edit segments alongside the frame clock, so only
+        the clips active at the current frame are held in memory.
+        """
+        end = self.total_frames if end is None else min(end, self.total_frames)
+        start = max(start, 0)
+        if start >= end:
+            return
+
+        segments = self.resolve_segments()
+        seg_idx = max(bisect_right(self._segment_starts, start / self.fps) - 1, 0)
+        last_idx = len(segments) - 1
+
+        for frame_num in range(start, end):
             timestamp = frame_num / self.fps
+            while seg_idx < last_idx and timestamp >= segments[seg_idx].end:
+                seg_idx += 1
+            segment = segments[seg_idx]
+
             frame = ResolvedFrame()
             frame.frame_number = frame_num
             frame.timestamp = timestamp
-            
-            # Process each track
-            for track in self.timeline.get("tracks", []):
-                # Find clips active at this timestamp
-                for clip in track.get("clips", []):
-                    clip_start = clip.get("startTime", 0) if isinstance(clip, dict) else (getattr(clip, "startTime", 0) if hasattr(clip, "startTime") else 0)
-                    clip_duration = clip.get("duration", 0) if isinstance(clip, dict) else (getattr(clip, "duration", 0) if hasattr(clip, "duration") else 0)
-                    clip_end = clip_start + clip_duration
-                    
-                    if clip_start <= timestamp < clip_end:
-                        track_type = track.get("type", "video")
-                        if track_type == "video":
-                            frame.video_clips.append({
-                                "clip": clip,
-                                "track": track,
-                                "local_time": timestamp - clip_start,
-                                "clipId": clip.get("clipId", "") if isinstance(clip, dict) else (getattr(clip, "clipId", "") if hasattr(clip, "clipId") else ""),
-                            })
-                        elif track_type == "audio":
-                            frame.audio_clips.append({
-                                "clip": clip,
-                                "track": track,
-                                "local_time": timestamp - clip_start,
-                            })
-                        elif track_type == "subtitle":
-                            frame.subtitles.append({
-                                "clip": clip,
-                                "track": track,
-                                "local_time": timestamp - clip_start,
-                            })
-            
-            # Collect transformations from active clips
-            for video_clip_data in frame.video_clips:
-                clip = video_clip_data["clip"]
-                for transform in clip.get("transformations", []):
-                    if transform.get("status") == "completed":
-                        frame.transformations.append({
-                            "type": transform["type"],
-                            "config": transform["config"],
-                            "clip": clip,
-                        })
-            
-            frames.append(frame)
-        
-        return frames
-    
-    def get_asset_dependencies(self) -> Dict[str, List[str]]:
-        """Extract all asset dependencies from timeline"""
-        dependencies = {
-            "videos": [],
-            "audio": [],
-            "subtitles": [],
-            "characters": [],
-            "voices": [],
-        }
-        
-        for track in self.timeline.get("tracks", []):
-            for clip in track.get("clips", []):
-                # Video dependencies
-                track_type = track.get("type", "video")
-                if track_type == "video":
-                    dependencies["videos"].append(clip.get("clipId", ""))
-                
-                # Audio dependencies (voice clones)
-                if clip.get("voiceId"):
-                    dependencies["voices"].append(clip["voiceId"])
-                if clip.get("voiceJobId"):
-                    # Will be resolved from job output
-                    pass
-                
-                # Character dependencies
-                if clip.get("characterId"):
-                    dependencies["characters"].append(clip["characterId"])
-                
-                # Subtitle dependencies
-                if track_type == "subtitle":
-                    dependencies["subtitles"].append(clip.get("clipId", ""))
-        
-        return dependencies
+            frame.video_clips = [self._at_time(data, timestamp) for data in segment.video_clips]
+            frame.audio_clips = [self._at_time(data, timestamp) for data in segment.audio_clips]
+            frame.subtitles = [self._at_time(data, timestamp) for data in segment.subtitles]
+            frame.transformations = segment.transformations
+            yield frame
+
+    @staticmethod
+    def _at_time(clip_data: Dict, timestamp: float) -> Dict:
+        """Copy segment clip data with local_time for a specific timestamp"""
+        frame_data = dict(clip_data)
+        frame_data["local_time"] = timestamp - clip_data["clip"].start
+        return frame_data
+
+    def resolve_segments(self) -> List[EditSegment]:
+        """
+        Convert timeline to a list of edit segments
+        Clip boundaries are sorted once and swept, so cost is O(clips log clips)
+        instead of O(frames * clips). Segments tile [0, duration) with no gaps;
+        ranges with nothing active are returned as empty segments.
+        """
+        if self._segments is not None:
+            return self._segments
+
+        timeline_end = self.timeline.duration_ms
+        # (time_ms, is_start, (order, track, clip))
+        events = []
+        order = 0
+        for track in self.timeline.tracks:
+            for clip in track.clips:
+                start = max(clip.start_ms, 0)
+                end = min(clip.end_ms, timeline_end)
+                if end > start:
+                    entry = (order, track, clip)
+                    events.append((start, 1, entry))
+                    events.append((end, 0, entry))
+                order += 1
+
+        # Ends sort before starts at the same time so abutting clips don't overlap
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        boundaries = sorted({0, timeline_end, *(e[0] for e in events)})
+        segments = []
+        active = {}
+        event_idx = 0
+        for seg_idx in range(len(boundaries) - 1):
+            seg_start = boundaries[seg_idx]
+            while event_idx < len(events) and events[event_idx][0] <= seg_start:
+                _, is_start, entry = events[event_idx]
+                if is_start:
+                    active[entry[0]] = entry
+                else:
+                    active.pop(entry[0], None)
+                event_idx += 1
+
+            segment = EditSegment(seg_start, boundaries[seg_idx + 1])
+            for key in sorted(active):
+                _, track, clip = active[key]
+                clip_data = {
+                    "clip": clip,
+                    "track": track,
+                    "local_time": (seg_start - clip.start_ms) / TICKS_PER_SECOND,
+                    "clipId": clip.clip_id,
+                }
+                if track.type == "video":
+                    segment.video_clips.append(clip_data)
+                    segment.transformations.extend(self._completed_transformations(clip))
+                elif track.type == "audio":
+                    segment.audio_clips.append(clip_data)
+                elif track.type == "subtitle":
+                    segment.subtitles.append(clip_data)
+            segments.append(segment)
+
+        self._segments = segments
+        self._segment_starts = [seg.start for seg in segments]
+        return segments
+
+    @staticmethod
+    def _completed_transformations(clip: TimelineClip) -> List[Dict]:
+        """Transformations of a video clip that are ready to apply"""
+        return [
+            {
+                "type": transform["type"],
+                "config": transform["config"],
+                "clip": clip,
+            }
+            for transform in clip.transformations
+            if transform.get("status") == "completed"
+        ]
+
+    def active_at(self, timestamp: float) -> Optional[EditSegment]:
+        """Return the segment active at timestamp (O(log segments))"""
+        segments = self.resolve_segments()
+        idx = bisect_right(self._segment_starts, timestamp) - 1
+        if idx < 0 or timestamp >= segments[idx].end:
+            return None
+        return segments[idx]
+
+    def segments_between(self, start: float, end: float) -> List[EditSegment]:
+        """Return segments overlapping [start, end)"""
+        segments = self.resolve_segments()
+        first = max(bisect_right(self._segment_starts, start) - 1, 0)
+        result = []
+        for segment in segments[first:]:
+            if segment.start >= end:
+                break
+            if segment.end > start:
+                result.append(segment)
+        return result
+
+    def segments_in_range(self, start_ms: int, end_ms: int) -> List[EditSegment]:
+        """Return segments clipped to [start_ms, end_ms), with local times adjusted"""
+        clipped = []
+        for segment in self.segments_between(start_ms / TICKS_PER_SECOND, end_ms / TICKS_PER_SECOND):
+            seg_start = max(segment.start_ms, start_ms)
+            seg_end = min(segment.end_ms, end_ms)
+            if seg_end > seg_start:
+                clipped.append(self._retime(segment, seg_start, seg_end))
+        return clipped
+
+    def render_pieces(self, max_ms: int) -> List[EditSegment]:
+        """
+        Split the timeline into deterministic render units for incremental renders
+        Each edit segment is snapped to the frame grid and cut into pieces of at
+        most max_ms, so a piece's content depends only on the clips active in it.
+        """
+        frame_ms = TICKS_PER_SECOND / self.fps
+
+        def snap(ms: float) -> int:
+            return int(round(round(ms / frame_ms) * frame_ms))
+
+        pieces = []
+        for segment in self.resolve_segments():
+            start, end = snap(segment.start_ms), snap(segment.end_ms)
+            while start < end:
+                piece_end = min(end, snap(start + max_ms))
+                pieces.append(self._retime(segment, start, piece_end))
+                start = piece_end
+        return pieces
+
+    @staticmethod
+    def _retime(segment: EditSegment, start_ms: int, end_ms: int) -> EditSegment:
+        """Copy a segment onto a new time range, adjusting clip local times"""
+        part = EditSegment(start_ms, end_ms)
+        shift = (start_ms - segment.start_ms) / TICKS_PER_SECOND
+        part.video_clips = [dict(d, local_time=d["local_time"] + shift) for d in segment.video_clips]
+        part.audio_clips = [dict(d, local_time=d["local_time"] + shift) for d in segment.audio_clips]
+        part.subtitles = [dict(d, local_time=d["local_time"] + shift) for d in segment.subtitles]
+        part.transformations = segment.transformations
+        return part
+
+    def chunk_ranges(self, count: int, gop_ms: int) -> List[Tuple[int, int]]:
+        """
+        Split the timeline into at most count ranges for parallel rendering
+        Boundaries fall on multiples of gop_ms so every chunk starts on a GOP boundary.
+        """
+        duration_ms = self.timeline.duration_ms
+        if duration_ms <= 0:
+            return []
+        step = -(-duration_ms // max(count, 1))  # ceil
+        step = max(-(-step // gop_ms) * gop_ms, gop_ms)
+        return [(start, min(start + step, duration_ms)) for start in range(0, duration_ms, step)]
+
+    def get_unique_clips(self) -> Dict[str, List[Dict]]:
+        """
+        Collect each clip placement exactly once, grouped by track type
+        Placements are keyed by the timeline clip id (falling back to clipId),
+        so a clip spanning many frames or segments is only returned once.
+        """
+        unique_clips = {"video": [], "audio": [], "subtitle": []}
+        seen = set()
+        timeline_end = self.timeline.duration_ms
+
+        for track in self.timeline.tracks:
+            if track.type not in unique_clips:
+                continue
+            for clip in track.clips:
+                key = (track.id, clip.id)
+                if key in seen:
+                    continue
+                if min(clip.end_ms, timeline_end) <= max(clip.start_ms, 0):
+                    continue
+                seen.add(key)
+                unique_clips[track.type].append({
+                    "clip": clip,
+                    "track": track,
+                    "local_time": 0.0,
+                    "clipId": clip.clip_id,
+                })
 
+        return unique_clips
@@ -0,0 +1,11 @@
+"""
+Test setup: worker modules import each other by bare name and the shared
+modules as common.* (as in the Docker image, see the Dockerfile's PYTHONPATH)
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, os.path.join(HERE, "..", ".."))
@@ -0,0 +1,74 @@
+"""
+Inline (amix graph) and NumPy (compose) audio paths must mix to the same level
+"""
+
+import os
+import shutil
+import wave
+
+import ffmpeg
+import numpy as np
+import pytest
+
+from audio_composer import AudioComposer
+from timeline_model import TimelineTrack
+
+SAMPLE_RATE = 44100
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+def write_tone(path: str, amplitude: float, seconds: float = 2.0, freq: float = 440.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    tone = (amplitude * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(tone.tobytes())
+
+
+def peak(path: str) -> float:
+    data, _ = (
+        ffmpeg.input(path)
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ar=SAMPLE_RATE, ac=2)
+        .run(capture_stdout=True, quiet=True)
+    )
+    return float(np.abs(np.frombuffer(data, np.float32)).max())
+
+
+def render_stream(clips: list, path: str) -> str:
+    stream = AudioComposer(clips, path, sample_rate=SAMPLE_RATE).build_stream()
+    ffmpeg.output(stream, path, acodec="pcm_f32le", ar=SAMPLE_RATE, ac=2).run(
+        overwrite_output=True, quiet=True
+    )
+    return path
+
+
+def overlapping_clips(tmp_path) -> list:
+    """Two tracks playing in-phase tones over the same two seconds"""
+    clips = []
+    for i in range(2):
+        tone_path = str(tmp_path / f"tone_{i}.wav")
+        write_tone(tone_path, 0.3)
+        track = TimelineTrack({
+            "id": f"track_{i}",
+            "type": "audio",
+            "clips": [{"id": f"clip_{i}", "startTime": 0, "duration": 2, "audioTrack": {"filePath": tone_path}}],
+        })
+        clips.append({"clip": track.clips[0], "track": track})
+    return clips
+
+
+def test_inline_mix_matches_compose_level(tmp_path):
+    clips = overlapping_clips(tmp_path)
+
+    composed = AudioComposer(clips, str(tmp_path / "composed.m4a"), sample_rate=SAMPLE_RATE).compose()
+
+    inline_path = render_stream(clips, str(tmp_path / "inline.wav"))
+    single_path = render_stream(clips[:1], str(tmp_path / "single.wav"))
+
+    # Both paths sum the clips; amix's default would scale each input by 1/2
+    assert os.path.exists(composed)
+    assert peak(inline_path) == pytest.approx(2 * peak(single_path), rel=0.02)
+    assert peak(inline_path) == pytest.approx(peak(composed), rel=0.05)  # AAC round trip
@@ -0,0 +1,124 @@
+"""
+Filter-graph regression checks for FFmpegBuilder
+"""
+
+import os
+import tempfile
+
+from ffmpeg_builder import FFmpegBuilder
+from timeline_model import Timeline
+from timeline_resolver import TimelineResolver
+
+
+def build_timeline(clips: list, duration: float) -> Timeline:
+    return Timeline.parse({
+        "duration": duration,
+        "tracks": [{"id": "video", "type": "video", "clips": clips}],
+    })
+
+
+def compile_multi_clip(timeline: Timeline, source_paths: dict) -> list:
+    resolver = TimelineResolver(timeline, fps=30)
+    builder = FFmpegBuilder(
+        video_clips=list(source_paths.values()),
+        audio_path="audio.aac",
+        output_path="out.mp4",
+    )
+    return builder.build_multi_clip(resolver.resolve_segments(), source_paths).compile()
+
+
+def test_one_input_per_distinct_source():
+    # a.mp4 is cut into the timeline three times, b.mp4 twice
+    placements = [("a", 0, 0), ("b", 2, 0), ("a", 4, 2), ("b", 6, 2), ("a", 8, 4)]
+    clips = [
+        {
+            "id": f"clip_{i}",
+            "clipId": name,
+            "filePath": f"s3://bucket/{name}.mp4",
+            "startTime": start,
+            "duration": 2,
+            "sourceStartTime": source_start,
+        }
+        for i, (name, start, source_start) in enumerate(placements)
+    ]
+    source_paths = {f"s3://bucket/{name}.mp4": f"/tmp/{name}.mp4" for name in ("a", "b")}
+
+    args = compile_multi_clip(build_timeline(clips, 10), source_paths)
+
+    inputs = [args[i + 1] for i, arg in enumerate(args) if arg == "-i"]
+    assert sorted(inputs) == sorted(["/tmp/a.mp4", "/tmp/b.mp4", "audio.aac"])
+
+
+def test_distant_uses_of_a_source_get_their_own_input():
+    # Cuts at 0 s and 3600 s of one file: seek twice instead of decoding the hour between
+    clips = [
+        {"id": "early", "clipId": "a", "filePath": "s3://bucket/a.mp4", "startTime": 0, "duration": 2},
+        {
+            "id": "late",
+            "clipId": "a",
+            "filePath": "s3://bucket/a.mp4",
+            "startTime": 2,
+            "duration": 2,
+            "sourceStartTime": 3600,
+        },
+    ]
+
+    args = compile_multi_clip(build_timeline(clips, 4), {"s3://bucket/a.mp4": "/tmp/a.mp4"})
+
+    assert args.count("/tmp/a.mp4") == 2
+    assert ["-ss", "3600.0", "-i", "/tmp/a.mp4"] == args[args.index("3600.0") - 1:args.index("3600.0") + 3]
+    assert "split" not in " ".join(args)
+
+
+def test_parts_use_a_container_that_carries_the_profile_codec():
+    clips = [{"id": "c", "clipId": "a", "filePath": "s3://bucket/a.mp4", "startTime": 0, "duration": 2}]
+    resolver = TimelineResolver(build_timeline(clips, 2), fps=30)
+    source_paths = {"s3://bucket/a.mp4": "/tmp/a.mp4"}
+
+    formats = {}
+    for profile in ("final", "final_hevc", "final_vp9"):
+        builder = FFmpegBuilder(video_clips=[], audio_path=None, output_path="part", profile=profile)
+        args = builder.build_multi_clip(resolver.resolve_segments(), source_paths, time_offset=0).compile()
+        formats[profile] = (args[args.index("-f", args.index("-map")) + 1], builder.part_extension)
+
+    assert formats == {
+        "final": ("mpegts", ".ts"),
+        "final_hevc": ("mpegts", ".ts"),
+        "final_vp9": ("matroska", ".mkv"),
+    }
+
+
+def test_concat_keeps_the_profile_codec_tag():
+    builder = FFmpegBuilder(video_clips=[], audio_path="audio.aac", output_path="out.mp4", profile="final_hevc")
+    args = builder.build_concat(["/tmp/part_0.ts"], os.path.join(tempfile.mkdtemp(), "parts.txt")).compile()
+
+    assert args[args.index("-tag:v") + 1] == "hvc1"
+
+
+def test_keyframes_are_scanned_only_in_copyable_ranges(monkeypatch):
+    streams = {
+        "/tmp/a.mp4": {"codec_name": "h264", "pix_fmt": "yuv420p", "width": 1920, "height": 1080, "r_frame_rate": "30/1"},
+        "/tmp/b.mp4": {"codec_name": "vp9", "pix_fmt": "yuv420p", "width": 1920, "height": 1080, "r_frame_rate": "30/1"},
+    }
+    scans = []
+
+    def probe(path, **kwargs):
+        if "show_entries" in kwargs:
+            scans.append((path, kwargs.get("read_intervals")))
+            return {"packets": []}
+        return {"streams": [streams[path]]}
+
+    monkeypatch.setattr("ffmpeg_builder.ffmpeg.probe", probe)
+    clips = [
+        {"id": "a", "clipId": "a", "filePath": "s3://bucket/a.mp4", "startTime": 0, "duration": 2, "sourceStartTime": 60},
+        {"id": "b", "clipId": "b", "filePath": "s3://bucket/b.mp4", "startTime": 2, "duration": 2},
+    ]
+    resolver = TimelineResolver(build_timeline(clips, 4), fps=30)
+    builder = FFmpegBuilder(video_clips=[], audio_path="audio.aac", output_path="out.mp4")
+
+    builder.plan_parts(
+        resolver.resolve_segments(), {"s3://bucket/a.mp4": "/tmp/a.mp4", "s3://bucket/b.mp4": "/tmp/b.mp4"}
+    )
+
+    # b.mp4 is VP9, so it is never scanned; a.mp4 only within its trimmed range
+    assert scans == [("/tmp/a.mp4", "60.0%62.0")]
@@ -0,0 +1,44 @@
+"""
+Render cache key checks
+"""
+
+from render_cache import compute_render_key
+from timeline_model import Timeline
+from timeline_resolver import TimelineResolver
+
+
+def voice_timeline() -> list:
+    timeline = Timeline.parse({
+        "duration": 4,
+        "tracks": [
+            {"id": "video", "type": "video", "clips": [
+                {"id": "v1", "clipId": "c1", "filePath": "s3://bucket/a.mp4", "startTime": 0, "duration": 4},
+            ]},
+            {"id": "voice", "type": "audio", "role": "voice", "clips": [
+                {
+                    "id": "a1",
+                    "clipId": "c1",
+                    "audioTrack": {"filePath": "s3://bucket/a.wav"},
+                    "voiceJobId": "job_1",
+                    "startTime": 0,
+                    "duration": 4,
+                },
+            ]},
+        ],
+    })
+    return TimelineResolver(timeline, fps=30).resolve_segments()
+
+
+def test_render_key_changes_when_voice_job_completes():
+    segments = voice_timeline()
+    hashes = {"s3://bucket/a.mp4": '"v"', "s3://bucket/a.wav": '"w"'}
+    pending = compute_render_key(segments, hashes, (1920, 1080), 30, "final", voice_outputs={})
+
+    output = "s3://bucket/voice/job_1.wav"
+    completed = compute_render_key(
+        segments, {**hashes, output: '"o1"'}, (1920, 1080), 30, "final", voice_outputs={"job_1": output}
+    )
+    regenerated = compute_render_key(
+        segments, {**hashes, output: '"o2"'}, (1920, 1080), 30, "final", voice_outputs={"job_1": output}
+    )
+    assert len({pending, completed, regenerated}) == 3
@@ -0,0 +1,71 @@
+"""
+Audio and subtitle stages get one input per distinct clip, not one per frame
+"""
+
+import os
+
+import ffmpeg
+import pytest
+
+from audio_composer import AudioComposer
+from timeline_model import Timeline
+from timeline_resolver import TimelineResolver
+
+FPS = 30
+
+
+def long_clip_timeline() -> Timeline:
+    """Two 20 s audio clips (600 frames each) and two long subtitle clips"""
+    return Timeline.parse({
+        "duration": 40,
+        "tracks": [
+            {"id": "music", "type": "audio", "clips": [
+                {"id": "m1", "clipId": "m1", "audioTrack": {"filePath": "/tmp/intro.wav"}, "startTime": 0, "duration": 20},
+                {"id": "m2", "clipId": "m2", "audioTrack": {"filePath": "/tmp/outro.wav"}, "startTime": 20, "duration": 20},
+            ]},
+            {"id": "subs", "type": "subtitle", "clips": [
+                {"id": "s1", "clipId": "s1", "subtitles": [{"text": "a"}], "startTime": 0, "duration": 15},
+                {"id": "s2", "clipId": "s2", "subtitles": [{"text": "b"}], "startTime": 15, "duration": 25},
+            ]},
+        ],
+    })
+
+
+def test_audio_stream_has_one_input_per_distinct_clip():
+    unique_clips = TimelineResolver(long_clip_timeline(), fps=FPS).get_unique_clips()
+    stream = AudioComposer(unique_clips["audio"], "out.aac").build_stream()
+
+    args = ffmpeg.output(stream, "out.wav").compile()
+
+    assert len(unique_clips["audio"]) == 2
+    assert args.count("-i") == 2
+
+
+def test_clips_sharing_an_asset_share_one_input():
+    timeline = Timeline.parse({
+        "duration": 40,
+        "tracks": [{"id": "music", "type": "audio", "clips": [
+            {"id": f"m{i}", "clipId": "m", "audioTrack": {"filePath": "/tmp/music.wav"}, "startTime": i * 10, "duration": 10}
+            for i in range(4)
+        ]}],
+    })
+    unique_clips = TimelineResolver(timeline, fps=FPS).get_unique_clips()
+    stream = AudioComposer(unique_clips["audio"], "out.aac").build_stream()
+
+    args = ffmpeg.output(stream, "out.wav").compile()
+
+    assert args.count("-i") == 1
+    assert "asplit=4" in args[args.index("-filter_complex") + 1]
+
+
+def test_subtitles_have_one_event_per_distinct_clip(tmp_path):
+    pytest.importorskip("pysrt")
+    from subtitle_renderer import SubtitleRenderer
+
+    unique_clips = TimelineResolver(long_clip_timeline(), fps=FPS).get_unique_clips()
+    ass_path = SubtitleRenderer(unique_clips["subtitle"], os.path.join(tmp_path, "subs.ass")).render_ass()
+
+    with open(ass_path, encoding="utf-8") as f:
+        events = [line for line in f if line.startswith("Dialogue:")]
+    assert len(unique_clips["subtitle"]) == 2
+    assert len(events) == 2
@@ -5,6 +5,7 @@ Uses Coqui TTS for voice cloning and text-to-speech
 """
 
 import os
+import threading
 import uuid
 from typing import Optional
 from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
@@ -16,6 +17,10 @@ from TTS.api import TTS
 import soundfile as sf
 import numpy as np
 
+from common.asset_cache import cache_from_env, download_dir
+from common.job_runner import runner_from_env
+from common.s3_transfer import transfer_config_from_env
+
 app = FastAPI(title="Voice Cloner Worker")
 
 # S3 client
@@ -33,11 +38,27 @@ WORKER_API_KEY = os.getenv("WORKER_API_KEY", "")
 
 # TTS model cache
 tts_models = {}
+tts_models_lock = threading.Lock()  # Concurrent jobs load each model once
+# Coqui's synthesizer keeps per-call state, so one inference per model at a time;
+# concurrent jobs still overlap their downloads, encoding and uploads
+tts_inference_lock = threading.Lock()
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
+# Multipart part size / concurrency for S3 transfers (S3_PART_SIZE_MB, S3_PART_CONCURRENCY)
+transfer_config = transfer_config_from_env()
+
+# Node-local asset cache shared with the other workers (ASSET_CACHE_DIR)
+asset_cache = cache_from_env(s3_client, transfer_config)
+
+# Downloads go next to the cache (same filesystem), so cache hits are hard links
+DOWNLOAD_DIR = download_dir(asset_cache)
+
 # In-memory job tracking
 jobs = {}
 
+# Inference and file I/O run on a thread pool (JOB_CONCURRENCY jobs at once)
+job_runner = runner_from_env(default_jobs=1)
+
 
 class ExecuteRequest(BaseModel):
     jobId: str
@@ -53,10 +74,17 @@ class ExecuteResponse(BaseModel):
 
 def get_tts_model(model_name: str = "tts_models/multilingual/multi-dataset/xtts_v2"):
     """Get or load TTS model"""
-    if model_name not in tts_models:
-        print(f"Loading TTS model: {model_name}")
-        tts_models[model_name] = TTS(model_name).to(device)
-    return tts_models[model_name]
+    with tts_models_lock:
+        if model_name not in tts_models:
+            print(f"Loading TTS model: {model_name}")
+            tts_models[model_name] = TTS(model_name).to(device)
+        return tts_models[model_name]
+
+
+def synthesize(tts, text: str, speaker_wav: str, language: str):
+    """Run voice-cloned TTS (blocking - run on the job pool)"""
+    with tts_inference_lock:
+        return tts.tts(text=text, speaker_wav=speaker_wav, language=language)
 
 
 def download_from_s3(s3_path: str, local_path: str):
@@ -69,13 +97,16 @@ def download_from_s3(s3_path: str, local_path: str):
     else:
         raise ValueError(f"Invalid S3 path: {s3_path}")
 
-    s3_client.download_file(bucket, key, local_path)
+    if asset_cache:
+        asset_cache.download(s3_path, local_path)
+    else:
+        s3_client.download_file(bucket, key, local_path, Config=transfer_config)
 
 
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """Upload file to S3 and return S3 path"""
     try:
-        s3_client.upload_file(file_path, BUCKET, s3_key)
+        s3_client.upload_file(file_path, BUCKET, s3_key, Config=transfer_config)
         return f"s3://{BUCKET}/{s3_key}"
     except ClientError as e:
         raise Exception(f"Failed to upload to S3: {e}")
@@ -99,38 +130,34 @@ async def process_voice_clone(
         await update_backend_status(job_id, 10, "processing")
 
         # Download source audio from S3
-        local_source = f"/tmp/source_{uuid.uuid4()}.wav"
-        download_from_s3(source_audio, local_source)
+        local_source = os.path.join(DOWNLOAD_DIR, f"source_{uuid.uuid4()}.wav")
+        await job_runner.run(download_from_s3, source_audio, local_source)
         jobs[job_id]["progress"] = 20
         await update_backend_status(job_id, 20, "processing")
 
         # Load TTS model (XTTS v2 for multilingual voice cloning)
         model_name = "tts_models/multilingual/multi-dataset/xtts_v2"
-        tts = get_tts_model(model_name)
+        tts = await job_runner.run(get_tts_model, model_name)
         jobs[job_id]["progress"] = 40
         await update_backend_status(job_id, 40, "processing")
 
         # Generate speech
         print(f"Generating speech: text='{text}', language='{language}'")
-        wav = tts.tts(
-            text=text,
-            speaker_wav=local_source,
-            language=language,
-        )
+        wav = await job_runner.run(synthesize, tts, text, local_source, language)
         jobs[job_id]["progress"] = 70
         await update_backend_status(job_id, 70, "processing")
 
         # Save to temporary file
         output_file = f"/tmp/output_{uuid.uuid4()}.wav"
-        sf.write(output_file, wav, tts.synthesizer.output_sample_rate)
+        await job_runner.run(sf.write, output_file, wav, tts.synthesizer.output_sample_rate)
 
         # Get audio metadata
-        audio_data, sample_rate = sf.read(output_file)
+        audio_data, sample_rate = await job_runner.run(sf.read, output_file)
         duration = len(audio_data) / sample_rate
 
         # Upload to S3
         s3_key = f"users/{user_id}/projects/{project_id or 'temp'}/audio/{uuid.uuid4()}.wav"
-        s3_path = upload_to_s3(output_file, s3_key)
+        s3_path = await job_runner.run(upload_to_s3, output_file, s3_key)
         jobs[job_id]["progress"] = 90
         await update_backend_status(job_id, 90, "processing")
 
@@ -226,6 +253,7 @@ async def execute(
 
     # Start background task
     background_tasks.add_task(
+        job_runner.submit,
         process_voice_clone,
         request.jobId,
         source_audio,
@@ -252,6 +280,7 @@ async def health():
         "gpu_available": gpu_available,
         "model_loaded": model_loaded,
         "device": device,
+        "jobs": job_runner.stats(),
         "version": "1.0.0",
     }
 